@@ -1,15 +1,37 @@
-import streamlit as st
+import os
 import sqlite3
+import tempfile
+import streamlit as st
 import pandas as pd
 import plotly.express as px
-from db import DB_NAME, add_user, delete_user, fetch_users, set_setting, get_setting
+from log_export import export_logs, ExportTooLarge
+from notifier import get_dispatcher
+from admin_scheduler import DEFAULT_REPORT_TIME
+from db import (
+    add_user, delete_user, fetch_users, set_setting, get_setting,
+    fetch_daily_stats, fetch_totals, fetch_logs_range, logs_version, fetch_recent_deliveries,
+    fetch_recent_clips
+)
+
+PAGE_SIZE = 100
+# the download button holds the whole file in memory; larger exports go
+# through log_export.py, which streams to disk
+MAX_EXPORT_ROWS = 100_000
+EXPORT_FORMATS = {"CSV": ".csv", "CSV (gzip)": ".csv.gz", "Parquet": ".parquet"}
+LOG_COLUMNS = ["id", "timestamp", "user_id", "ear", "status"]
 
 # ------------------ DB Utility ------------------
-def fetch_logs():
-    conn = sqlite3.connect(DB_NAME)
-    df = pd.read_sql("SELECT * FROM logs", conn)
-    conn.close()
-    return df
+# Cached per logs_version(), so results are reused across reruns until new
+# events are written (or logs are deleted).
+@st.cache_data(max_entries=8)
+def fetch_daily_df(version):
+    return pd.DataFrame(fetch_daily_stats(), columns=["date", "user_id", "total", "drowsy"])
+
+@st.cache_data(max_entries=64)
+def fetch_logs_page(version, start_day, end_day, page):
+    rows = fetch_logs_range(start_day, end_day, limit=PAGE_SIZE, offset=page * PAGE_SIZE)
+    return pd.DataFrame(rows, columns=LOG_COLUMNS)
+
 
 # ------------------ Admin Dashboard ------------------
 def render_admin_dashboard(dark_mode=False):
@@ -52,29 +74,30 @@ def render_admin_dashboard(dark_mode=False):
     # ------------------ Analytics ------------------
     with tabs[1]:
         st.subheader("Detection Analytics")
-        df = fetch_logs()
+        version = logs_version()
+        daily_stats = fetch_daily_df(version)
 
-        if df.empty:
+        if daily_stats.empty:
             st.info("No logs available yet.")
         else:
-            # Filter Drowsy only
-            df_drowsy = df[df["status"] == "Drowsy"]
+            drowsy_days = daily_stats[daily_stats["drowsy"] > 0]
 
-            if df_drowsy.empty:
+            if drowsy_days.empty:
                 st.info("No Drowsy events logged.")
             else:
                 # Date filter
-                min_date = pd.to_datetime(df_drowsy["timestamp"]).min().date()
-                max_date = pd.to_datetime(df_drowsy["timestamp"]).max().date()
+                min_date = pd.to_datetime(drowsy_days["date"].min()).date()
+                max_date = pd.to_datetime(drowsy_days["date"].max()).date()
                 date_range = st.date_input("Select Date Range:", [min_date, max_date])
 
                 start_date, end_date = date_range if len(date_range) == 2 else (min_date, max_date)
-                mask = (pd.to_datetime(df_drowsy["timestamp"]).dt.date >= start_date) & \
-                       (pd.to_datetime(df_drowsy["timestamp"]).dt.date <= end_date)
-                filtered_df = df_drowsy[mask]
+                in_range = drowsy_days[
+                    (drowsy_days["date"] >= start_date.isoformat()) &
+                    (drowsy_days["date"] <= end_date.isoformat())
+                ]
 
                 # Drowsy events per user
-                user_counts = filtered_df.groupby("user_id")["status"].count().reset_index()
+                user_counts = in_range.groupby("user_id")["drowsy"].sum().reset_index()
                 user_counts.columns = ["User ID", "Drowsy Events"]
                 bar_chart = px.bar(
                     user_counts, x="User ID", y="Drowsy Events",
@@ -84,8 +107,7 @@ def render_admin_dashboard(dark_mode=False):
                 st.plotly_chart(bar_chart, use_container_width=True)
 
                 # Over time
-                filtered_df["date"] = pd.to_datetime(filtered_df["timestamp"]).dt.date
-                daily = filtered_df.groupby("date")["status"].count().reset_index()
+                daily = in_range.groupby("date")["drowsy"].sum().reset_index()
                 daily.columns = ["Date", "Drowsy Count"]
                 line_chart = px.line(
                     daily, x="Date", y="Drowsy Count",
@@ -97,42 +119,102 @@ def render_admin_dashboard(dark_mode=False):
                 # System health stats
                 st.subheader("System Health")
                 total_users = len(fetch_users())
-                total_events = len(df)
-                total_drowsy = len(df_drowsy)
+                total_events, total_drowsy = fetch_totals()
                 st.markdown(f"""
                 - 👥 **Total Users:** {total_users}  
                 - 📦 **Total Logs:** {total_events}  
                 - 🚨 **Drowsy Events:** {total_drowsy}
                 """)
 
-                # Show filtered logs
+                with st.expander("Notification Delivery"):
+                    st.table(pd.DataFrame(get_dispatcher().stats()).T)
+                    st.dataframe(pd.DataFrame(
+                        fetch_recent_deliveries(),
+                        columns=["Time", "Channel", "Recipient", "OK", "Attempt", "Error", "Latency (ms)"]
+                    ))
+
+                # Pre/post-event footage saved for Drowsy events
+                with st.expander("Event Clips"):
+                    clips = pd.DataFrame(
+                        fetch_recent_clips(),
+                        columns=["Clip", "Time", "User", "Status", "Frames", "Bytes", "Path", "Log Rows"]
+                    )
+                    st.dataframe(clips.drop(columns=["Path"]))
+                    saved = clips[clips["Status"] == "saved"]
+                    if not saved.empty:
+                        clip_id = st.selectbox("Play clip", saved["Clip"])
+                        path = saved.loc[saved["Clip"] == clip_id, "Path"].iloc[0]
+                        if os.path.exists(path):
+                            st.video(path)
+                        else:
+                            st.warning(f"Clip file {path} is missing.")
+
+                # Show filtered logs, one page at a time
                 st.subheader("Log Records")
-                st.dataframe(filtered_df)
-
-                # Export to CSV
-                csv = filtered_df.to_csv(index=False).encode("utf-8")
-                st.download_button(
-                    label="Download Logs as CSV",
-                    data=csv,
-                    file_name="drowsy_logs.csv",
-                    mime="text/csv"
+                start_day, end_day = start_date.isoformat(), end_date.isoformat()
+                total_rows = int(in_range["drowsy"].sum())
+                pages = max(1, -(-total_rows // PAGE_SIZE))
+                page = st.number_input(
+                    f"Page (1-{pages}, {PAGE_SIZE} rows each)",
+                    min_value=1, max_value=pages, value=1, step=1
                 )
+                st.dataframe(fetch_logs_page(version, start_day, end_day, page - 1))
+
+                # Export: streamed to a temp file in chunks, offered for download
+                # on this run only and deleted straight away, so reruns never
+                # re-read it and nothing is left behind in the temp directory
+                export_format = st.selectbox("Export Format", list(EXPORT_FORMATS))
+                include_archive = st.checkbox("Include archived logs")
+                cli_hint = (f"Export larger ranges with `python log_export.py --start {start_day} "
+                            f"--end {end_day} --output logs.csv.gz`.")
+                if total_rows > MAX_EXPORT_ROWS:
+                    st.info(f"The dashboard exports up to {MAX_EXPORT_ROWS} records. {cli_hint}")
+                elif st.button("Prepare Export"):
+                    suffix = EXPORT_FORMATS[export_format]
+                    fd, path = tempfile.mkstemp(prefix="drowsy_logs_", suffix=suffix)
+                    os.close(fd)
+                    try:
+                        count = export_logs(path, start_day, end_day, include_archive=include_archive,
+                                            max_rows=MAX_EXPORT_ROWS)
+                        with open(path, "rb") as f:
+                            data = f.read()
+                    except ExportTooLarge as e:
+                        st.error(f"{e}. {cli_hint}")
+                    except (RuntimeError, ValueError, OSError, sqlite3.Error) as e:
+                        st.error(f"Export failed: {e}")
+                    else:
+                        st.success(f"Exported {count} log records.")
+                        st.download_button(
+                            label="Download Logs",
+                            data=data,
+                            file_name="drowsy_logs" + suffix,
+                        )
+                        st.caption("The download is available until the page next updates.")
+                    finally:
+                        os.remove(path)
 
     # ------------------ Report Config ------------------
     with tabs[2]:
         st.subheader("Daily Report Configuration")
 
         # Load existing config
-        report_time = get_setting("report_time") or "09:00"
+        report_time = get_setting("report_time") or DEFAULT_REPORT_TIME
         report_email = get_setting("report_email") or ""
         report_telegram = get_setting("report_telegram") or ""
+        alert_window = int(float(get_setting("alert_window_seconds") or 300))
 
         time_input = st.time_input("Daily Summary Time", pd.to_datetime(report_time).time())
-        email_input = st.text_input("Report Email Recipient", value=report_email)
-        telegram_input = st.text_input("Report Telegram ID", value=report_telegram)
+        email_input = st.text_input("Report Email Recipients (comma separated)", value=report_email)
+        telegram_input = st.text_input("Report Telegram IDs (comma separated)", value=report_telegram)
+        window_input = st.number_input(
+            "Alert Digest Window (seconds)", min_value=0, max_value=3600,
+            value=alert_window, step=30,
+            help="Repeated alerts for the same driver within this window are sent as one digest."
+        )
 
         if st.button("Save Report Settings"):
             set_setting("report_time", time_input.strftime("%H:%M"))
             set_setting("report_email", email_input)
             set_setting("report_telegram", telegram_input)
+            set_setting("alert_window_seconds", str(window_input))
             st.success("Report settings saved successfully.")
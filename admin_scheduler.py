@@ -1,59 +1,152 @@
-import sqlite3
-from datetime import datetime
-import time
+from datetime import date, datetime, timedelta
+import os
 import threading
-import schedule
 
-from db import DB_NAME, get_setting
-from email_alert import send_email_alert
-from telegram_alert import send_telegram_alert
+from db import get_setting, fetch_totals, get_job_run, record_job_run, subscribe
+from summary import summarize_new_logs, build_period_report, week_range, month_range
 
-def send_admin_summary():
-    """Send a daily summary to admin"""
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-
-    c.execute("SELECT COUNT(*) FROM logs")
-    total_logs = c.fetchone()[0]
-
-    c.execute("SELECT COUNT(*) FROM logs WHERE status='Drowsy'")
-    drowsy_events = c.fetchone()[0]
-
-    c.execute("""
-        SELECT u.username, COUNT(l.id) as logs
-        FROM users u
-        LEFT JOIN logs l ON u.id = l.user_id
-        GROUP BY u.username
-        ORDER BY logs DESC
-        LIMIT 3
-    """)
-    top_users = c.fetchall()
-    conn.close()
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+LOCK_FILE = "scheduler.lock"
+DEFAULT_REPORT_TIME = "20:00"
+# safety net for settings saved by another process, which cannot wake us
+MAX_SLEEP_SECONDS = 900
 
+_settings_changed = threading.Event()
+_start_lock = threading.Lock()
+_scheduler_thread = None
+_lock_handle = None
+
+def format_report(title, report, all_time=None):
+    top_users = report["top_users"]
     top_users_str = "\n".join([f"{user}: {count} logs" for user, count in top_users]) if top_users else "No users"
+    span = report["start"] if report["start"] == report["end"] else f"{report['start']} – {report['end']}"
 
     message = (
-        f"📊 Drowsiness System Daily Report ({datetime.now().date()})\n\n"
-        f"📝 Total Logs: {total_logs}\n"
-        f"⚠️ Drowsy Events: {drowsy_events}\n\n"
-        f"🏆 Top Users:\n{top_users_str}"
+        f"📊 Drowsiness System {title} ({span})\n\n"
+        f"📝 New Logs: {report['total_logs']}\n"
+        f"⚠️ Drowsy Events: {report['drowsy_logs']}\n"
     )
+    if all_time:
+        message += f"📦 All-time: {all_time[0]} logs, {all_time[1]} drowsy\n"
+    return message + f"\n🏆 Top Users:\n{top_users_str}"
+
+def send_admin_summary():
+    """Send a summary of logs added since the last report (plus weekly/monthly rollups)"""
+    # imported here: the notifier stack (smtplib, requests) is not
+    # needed until the first report goes out
+    from notifier import get_dispatcher
+
+    today = date.today()
+    daily = summarize_new_logs(today.isoformat())
+    messages = [format_report("Daily Report", daily, fetch_totals())]
+
+    if today.weekday() == 0:
+        messages.append(format_report("Weekly Report", build_period_report(*week_range(today))))
+    if today.day == 1:
+        messages.append(format_report("Monthly Report", build_period_report(*month_range(today))))
+
+    for message in messages:
+        get_dispatcher().notify(message)
+    print("✅ Daily summary queued for admin")
 
-    send_email_alert(message)
-    send_telegram_alert(message)
-    print("✅ Daily summary sent to admin")
+# job name -> function; each runs once per day at the configured report time
+JOBS = {
+    "daily_summary": send_admin_summary,
+}
+
+def _on_db_change(kind, key):
+    """Wake the scheduler so it re-reads its settings now."""
+    if kind == "settings":
+        _settings_changed.set()
+
+def _report_time():
+    time_str = get_setting("report_time") or get_setting("scheduler_time") or DEFAULT_REPORT_TIME
+    hour, minute = (int(part) for part in time_str.split(":"))
+    return hour, minute
+
+def _last_due(now, hour, minute):
+    """Most recent scheduled time at or before `now`."""
+    due = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    return due if due <= now else due - timedelta(days=1)
+
+def run_pending(now=None):
+    """
+    Run every job that has not run for the day of its latest due time (this
+    also catches up a run missed while the app was down). Runs are tracked by
+    calendar day, so changing the report time never repeats a day's report.
+    Returns the next due time.
+    """
+    now = now or datetime.now()
+    enabled = get_setting("scheduler_enabled", "1") == "1"
+    hour, minute = _report_time()
+    due = _last_due(now, hour, minute)
+
+    if enabled:
+        for name, job in JOBS.items():
+            last = get_job_run(name)
+            # never-run jobs start at the next due time instead of firing at once
+            if last is None:
+                record_job_run(name, int(due.timestamp()), "skipped")
+                continue
+            if datetime.fromtimestamp(last["due_ts"]).date() < due.date():
+                try:
+                    job()
+                    record_job_run(name, int(due.timestamp()), "ok")
+                except Exception as e:
+                    record_job_run(name, int(due.timestamp()), "failed", str(e))
+                    print(f"⚠️ Scheduled job {name} failed: {e}")
+
+    return due + timedelta(days=1)
 
 def run_scheduler():
-    """Run scheduler based on settings"""
+    """Run jobs at their due time, waking early when settings change"""
     while True:
-        enabled = get_setting("scheduler_enabled", "1") == "1"
-        time_str = get_setting("scheduler_time", "20:00")
-
-        schedule.clear()
+        _settings_changed.clear()
+        try:
+            next_due = run_pending()
+            wait = (next_due - datetime.now()).total_seconds()
+        except Exception as e:
+            print(f"⚠️ Scheduler error: {e}")
+            wait = 60
+        _settings_changed.wait(min(max(wait, 1), MAX_SLEEP_SECONDS))
 
-        if enabled:
-            schedule.every().day.at(time_str).do(send_admin_summary)
+def _acquire_process_lock(path=LOCK_FILE):
+    """Take an exclusive, non-blocking lock held for the life of the process."""
+    handle = open(path, "a+")
+    try:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        handle.close()
+        return None
+    handle.seek(0)
+    handle.truncate()
+    handle.write(str(os.getpid()))
+    handle.flush()
+    return handle
 
-        while True:
-            schedule.run_pending()
-            time.sleep(60)
+def start_scheduler():
+    """
+    Start the scheduler thread unless this or another process already runs
+    it. Safe to call on every Streamlit rerun. Returns True if it is running
+    in this process.
+    """
+    global _scheduler_thread, _lock_handle
+    with _start_lock:
+        if _scheduler_thread is not None:
+            return True
+        _lock_handle = _acquire_process_lock()
+        if _lock_handle is None:
+            return False
+        subscribe(_on_db_change)
+        _scheduler_thread = threading.Thread(target=run_scheduler, name="scheduler", daemon=True)
+        _scheduler_thread.start()
+        return True
@@ -0,0 +1,97 @@
+# alert_coalescer.py
+"""
+Coalesces repeated drowsiness alerts during alert storms.
+
+The first alert for a key (user/device) is sent immediately and opens a
+window of `window` seconds. Further alerts for that key inside the window
+are only counted; when the window closes one digest message with the count
+and time span is sent and, if anything was merged, a new window starts.
+"""
+import threading
+import time
+from datetime import datetime
+
+from notifier import get_dispatcher
+
+WINDOW_SECONDS = 300
+
+
+class AlertCoalescer:
+    def __init__(self, window=WINDOW_SECONDS, notify=None):
+        self.window = window
+        self.notify = notify or (lambda message: get_dispatcher().notify(message))
+        self.windows = {}  # key -> {"ends": t, "count": n, "first": t, "last": t}
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def alert(self, key, message, now=None):
+        """Send now, or merge into the open window for `key`. Returns True if sent now."""
+        now = time.time() if now is None else now
+        with self.lock:
+            w = self.windows.get(key)
+            if w is None:
+                self.windows[key] = {"ends": now + self.window, "count": 0, "first": None, "last": None}
+                send = True
+            else:
+                w["count"] += 1
+                w["first"] = w["first"] or now
+                w["last"] = now
+                send = False
+        if send:
+            self.notify(message)
+            self.wake.set()
+        return send
+
+    def _digest(self, key, w):
+        first = datetime.fromtimestamp(w["first"]).strftime("%H:%M:%S")
+        last = datetime.fromtimestamp(w["last"]).strftime("%H:%M:%S")
+        return (f"🚨 {w['count']} more drowsiness alert(s) for {key} "
+                f"between {first} and {last}")
+
+    def flush_due(self, now=None):
+        """Close windows that have ended, sending digests; returns the digests sent."""
+        now = time.time() if now is None else now
+        digests = []
+        with self.lock:
+            for key, w in list(self.windows.items()):
+                if w["ends"] > now:
+                    continue
+                if w["count"]:
+                    digests.append(self._digest(key, w))
+                    # the storm is still going: keep merging for another window
+                    self.windows[key] = {"ends": now + self.window, "count": 0,
+                                         "first": None, "last": None}
+                else:
+                    del self.windows[key]
+        for message in digests:
+            self.notify(message)
+        return digests
+
+    def _next_deadline(self):
+        with self.lock:
+            return min((w["ends"] for w in self.windows.values()), default=None)
+
+    def _run(self):
+        while True:
+            deadline = self._next_deadline()
+            timeout = None if deadline is None else max(0.0, deadline - time.time())
+            self.wake.wait(timeout)
+            self.wake.clear()
+            self.flush_due()
+
+
+_coalescer = None
+_coalescer_lock = threading.Lock()
+
+
+def get_coalescer(window=WINDOW_SECONDS):
+    """The process-wide coalescer; `window` updates the merge window in place."""
+    global _coalescer
+    with _coalescer_lock:
+        if _coalescer is None:
+            _coalescer = AlertCoalescer(window)
+        else:
+            _coalescer.window = window
+        return _coalescer
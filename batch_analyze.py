@@ -0,0 +1,225 @@
+# batch_analyze.py
+"""
+Offline drowsiness analysis of recorded video.
+
+    python batch_analyze.py dashcam/ --output results/ --workers 4
+
+For every input video this writes `<name>.csv` (per-frame EAR/MAR/status)
+and `<name>_episodes.csv` (one row per continuous Drowsy run). Videos are
+split into frame ranges that are analyzed in parallel.
+
+The detector's consecutive-frame counter is only reset by a face with open
+eyes and mouth, so its value at the start of a range can depend on any
+number of earlier frames. Each range therefore starts from a zero counter
+and also reports its frames up to the first reset; the parent then carries
+the counter over from the previous range and marks those frames Drowsy
+where the sequential run would have. Statuses match a single sequential
+run exactly. With --track, the tracker's state cannot be carried over, so
+each range replays one detection interval first; EAR/MAR in a range's
+first frames can then differ slightly from a sequential run (use
+--chunk-frames 0 where that matters).
+"""
+import argparse
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+
+from drowsiness import DrowsinessDetector
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".m4v")
+MODEL_PATH = "models/shape_predictor_68_face_landmarks.dat"
+
+_detector = None
+
+
+def _init_worker(model_path, settings):
+    global _detector
+    _detector = DrowsinessDetector(model_path, **settings)
+
+
+def find_videos(paths):
+    videos = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith(VIDEO_EXTENSIONS):
+                    videos.append(os.path.join(path, name))
+        else:
+            videos.append(path)
+    return videos
+
+
+def plan_chunks(video, chunk_frames):
+    """Split a video into (video, start, end) frame ranges; end=None reads to EOF."""
+    cap = cv2.VideoCapture(video)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    if total <= 0 or chunk_frames <= 0:
+        return [(video, 0, None)]
+
+    starts = list(range(0, total, chunk_frames))
+    return [(video, s, s + chunk_frames if i < len(starts) - 1 else None)
+            for i, s in enumerate(starts)]
+
+
+def _open_at(video, first):
+    """Open a video positioned at frame `first`."""
+    cap = cv2.VideoCapture(video)
+    if first and not (cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+                      and int(cap.get(cv2.CAP_PROP_POS_FRAMES)) == first):
+        # some codecs/containers only seek to a keyframe; decode up to it instead
+        cap.release()
+        cap = cv2.VideoCapture(video)
+        for _ in range(first):
+            if not cap.grab():
+                break
+    return cap
+
+
+def analyze_chunk(video, start, end, warmup):
+    """
+    Analyze frames [start, end) of a video, replaying `warmup` frames first.
+    Returns the rows plus what carry_counter() needs to make them match a
+    sequential run.
+    """
+    _detector.reset()
+    first = max(0, start - warmup)
+    cap = _open_at(video, first)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+
+    rows = []
+    prefix = []     # (row, face flags) up to and including the first reset
+    reset = False
+    index = first
+    while end is None or index < end:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if index == start:
+            _detector.frame_counter = 0  # warm-up only primes the tracker
+        status, ear, mar, faces = _detector.analyze(frame)
+        if index >= start:
+            flags = [flagged for _, flagged in faces]
+            if not reset and flags:
+                prefix.append((len(rows), flags))
+                reset = not all(flags)
+            rows.append((index, round(index / fps, 3), round(ear, 4), round(mar, 4), status))
+        index += 1
+
+    cap.release()
+    return {"rows": rows, "prefix": prefix, "reset": reset, "counter": _detector.frame_counter}
+
+
+def carry_counter(chunk, counter, frame_check):
+    """
+    Apply the consecutive-frame counter left by the previous range to a
+    range's leading frames (fixing their statuses in place); returns the
+    counter at the end of this range.
+    """
+    rows = chunk["rows"]
+    carried = counter
+    for row, flags in chunk["prefix"]:
+        for flagged in flags:
+            if not flagged:
+                break  # reset; the range computed everything after it itself
+            carried += 1
+            if carried >= frame_check and rows[row][4] != "Drowsy":
+                rows[row] = rows[row][:4] + ("Drowsy",)
+    return chunk["counter"] if chunk["reset"] else counter + chunk["counter"]
+
+
+def find_episodes(rows):
+    """Group consecutive Drowsy frames into episodes."""
+    episodes = []
+    current = None
+    for frame, t, ear, mar, status in rows:
+        if status == "Drowsy":
+            if current is None:
+                current = {"start_frame": frame, "start_s": t, "min_ear": ear, "max_mar": mar}
+            current.update(end_frame=frame, end_s=t)
+            current["min_ear"] = min(current["min_ear"], ear)
+            current["max_mar"] = max(current["max_mar"], mar)
+        elif current is not None:
+            episodes.append(current)
+            current = None
+    if current is not None:
+        episodes.append(current)
+
+    for ep in episodes:
+        ep["duration_s"] = round(ep["end_s"] - ep["start_s"], 3)
+    return episodes
+
+
+def write_results(video, rows, output_dir):
+    name = os.path.splitext(os.path.basename(video))[0]
+
+    with open(os.path.join(output_dir, f"{name}.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["frame", "time_s", "ear", "mar", "status"])
+        writer.writerows(rows)
+
+    episodes = find_episodes(rows)
+    fields = ["start_frame", "end_frame", "start_s", "end_s", "duration_s", "min_ear", "max_mar"]
+    with open(os.path.join(output_dir, f"{name}_episodes.csv"), "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(episodes)
+    return episodes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze recorded videos for drowsiness.")
+    parser.add_argument("inputs", nargs="+", help="video files or directories of videos")
+    parser.add_argument("--output", default="results", help="directory for CSV results")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--chunk-frames", type=int, default=3000,
+                        help="frames per work unit (0 = one unit per video)")
+    parser.add_argument("--model", default=MODEL_PATH, help="dlib 68-point shape predictor")
+    parser.add_argument("--ear-thresh", type=float, default=0.25)
+    parser.add_argument("--mar-thresh", type=float, default=0.5)
+    parser.add_argument("--frame-check", type=int, default=20)
+    parser.add_argument("--detect-scale", type=float, default=1.0)
+    parser.add_argument("--track", action="store_true", help="track the face between detections")
+    args = parser.parse_args()
+
+    videos = find_videos(args.inputs)
+    if not videos:
+        parser.error("no videos found")
+    os.makedirs(args.output, exist_ok=True)
+
+    settings = {
+        "ear_thresh": args.ear_thresh,
+        "mar_thresh": args.mar_thresh,
+        "frame_check": args.frame_check,
+        "track": args.track,
+        "detect_scale": args.detect_scale,
+    }
+    # the counter is carried over exactly (see carry_counter); only a tracker
+    # needs frames before the range, at most one detection interval to lock on
+    warmup = 10 if args.track else 0
+
+    chunks = [c for v in videos for c in plan_chunks(v, args.chunk_frames)]
+    print(f"Analyzing {len(videos)} video(s) in {len(chunks)} chunk(s) with {args.workers} worker(s)")
+
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                             initargs=(args.model, settings)) as pool:
+        futures = [pool.submit(analyze_chunk, video, start, end, warmup)
+                   for video, start, end in chunks]
+
+        results = {video: [] for video in videos}
+        counters = {video: 0 for video in videos}
+        for (video, _, _), future in zip(chunks, futures):
+            chunk = future.result()
+            counters[video] = carry_counter(chunk, counters[video], args.frame_check)
+            results[video].extend(chunk["rows"])
+
+    for video in videos:
+        episodes = write_results(video, results[video], args.output)
+        print(f"✅ {video}: {len(results[video])} frames, {len(episodes)} drowsy episode(s)")
+
+
+if __name__ == "__main__":
+    main()
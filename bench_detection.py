@@ -0,0 +1,224 @@
+# bench_detection.py
+"""
+Benchmark DrowsinessDetector.analyze_frame.
+
+    python bench_detection.py --face-image assets/face.jpg --output bench.json
+    python bench_detection.py --video drive.mp4 --compare bench.json
+
+Frames are synthetic noise, a face image tiled 1..N times, and/or frames
+read from a recorded video, at several resolutions. For every detector
+configuration it reports throughput, p50/p95/p99 latency and peak memory,
+and saves everything as JSON so runs can be compared. Python allocations
+are traced in a separate pass after the timed loop, since tracemalloc
+slows every allocation down. Peak RSS is measured per case (the kernel's
+high-water mark is reset before each one), which needs Linux; elsewhere
+it is reported as null.
+"""
+import argparse
+import json
+import os
+import platform
+import time
+import tracemalloc
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from drowsiness import DrowsinessDetector, load_shape_predictor
+
+MODEL_PATH = "models/shape_predictor_68_face_landmarks.dat"
+RESOLUTIONS = {"480p": (640, 480), "720p": (1280, 720), "1080p": (1920, 1080)}
+CONFIGS = {
+    "baseline": {"track": False, "detect_scale": 1.0},
+    "scaled": {"track": False, "detect_scale": 0.5},
+    "tracked": {"track": True, "detect_scale": 0.5},
+}
+
+
+def synthetic_frames(size, count=8, seed=0):
+    rng = np.random.default_rng(seed)
+    w, h = size
+    return [rng.integers(0, 256, (h, w, 3), dtype=np.uint8) for _ in range(count)]
+
+
+def tiled_face_frames(face, size, faces):
+    """One frame with `faces` copies of the face image side by side."""
+    w, h = size
+    frame = np.full((h, w, 3), 96, dtype=np.uint8)
+    tile_w = w // faces
+    scale = min(tile_w / face.shape[1], h / face.shape[0]) * 0.8
+    tile = cv2.resize(face, (int(face.shape[1] * scale), int(face.shape[0] * scale)))
+    y = (h - tile.shape[0]) // 2
+    for i in range(faces):
+        x = i * tile_w + (tile_w - tile.shape[1]) // 2
+        frame[y:y + tile.shape[0], x:x + tile.shape[1]] = tile
+    return [frame]
+
+
+def video_frames(path, size, limit=300):
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < limit:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(cv2.resize(frame, size))
+    cap.release()
+    return frames
+
+
+def _proc_status_mb(field):
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def reset_peak_rss():
+    """Restart the peak-RSS measurement (Linux only); returns the current RSS in MB or None."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        return None
+    return _proc_status_mb("VmRSS")
+
+
+def peak_rss_mb():
+    """Peak RSS in MB since reset_peak_rss(), or None where it cannot be measured."""
+    return _proc_status_mb("VmHWM")
+
+
+def run_case(detector, frames, iterations, warmup, draw=True):
+    rss_start = reset_peak_rss()
+    work = np.empty_like(frames[0])
+    detector.reset()
+
+    for i in range(warmup):
+        np.copyto(work, frames[i % len(frames)])
+        detector.analyze_frame(work, draw=draw)
+
+    latencies = np.empty(iterations)
+    start = time.perf_counter()
+    for i in range(iterations):
+        # annotation draws on the frame, so analyze a fresh copy every time
+        np.copyto(work, frames[i % len(frames)])
+        t0 = time.perf_counter()
+        detector.analyze_frame(work, draw=draw)
+        latencies[i] = time.perf_counter() - t0
+    elapsed = time.perf_counter() - start
+
+    # untimed pass over every source frame, only for the allocation peak
+    tracemalloc.start()
+    for frame in frames[:iterations]:
+        np.copyto(work, frame)
+        detector.analyze_frame(work, draw=draw)
+    _, py_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    peak_rss = peak_rss_mb() if rss_start is not None else None
+    p50, p95, p99 = np.percentile(latencies * 1000, [50, 95, 99])
+    return {
+        "frames": iterations,
+        "fps": round(iterations / elapsed, 2),
+        "mean_ms": round(float(latencies.mean() * 1000), 3),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "peak_python_alloc_mb": round(py_peak / (1024 * 1024), 3),
+        "peak_rss_mb": round(peak_rss, 1) if peak_rss is not None else None,
+        "rss_growth_mb": round(peak_rss - rss_start, 1) if peak_rss is not None else None,
+    }
+
+
+def build_sources(args, size):
+    sources = {"noise": synthetic_frames(size)}
+    if args.face_image:
+        face = cv2.imread(args.face_image)
+        if face is None:
+            raise SystemExit(f"Cannot read face image: {args.face_image}")
+        for n in args.faces:
+            sources[f"faces_{n}"] = tiled_face_frames(face, size, n)
+    if args.video:
+        frames = video_frames(args.video, size)
+        if frames:
+            sources["video"] = frames
+    return sources
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {case["name"]: case for case in json.load(f)["cases"]}
+
+    print(f"\nComparison with {baseline_path} (p95 ms, fps):")
+    for case in results["cases"]:
+        old = baseline.get(case["name"])
+        if old is None:
+            continue
+        p95 = (case["p95_ms"] - old["p95_ms"]) / old["p95_ms"] * 100 if old["p95_ms"] else 0.0
+        fps = (case["fps"] - old["fps"]) / old["fps"] * 100 if old["fps"] else 0.0
+        print(f"  {case['name']:<32} p95 {p95:+6.1f}%   fps {fps:+6.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the detection hot path.")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--resolutions", nargs="+", default=list(RESOLUTIONS),
+                        choices=list(RESOLUTIONS))
+    parser.add_argument("--configs", nargs="+", default=list(CONFIGS), choices=list(CONFIGS))
+    parser.add_argument("--face-image", help="image containing one face, tiled for multi-face cases")
+    parser.add_argument("--faces", nargs="+", type=int, default=[1, 2, 4])
+    parser.add_argument("--video", help="recorded video to take real frames from")
+    parser.add_argument("--headless", action="store_true",
+                        help="analyze without drawing the overlay")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="previous results JSON to compare against")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    load_shape_predictor(args.model)
+    model_load_s = time.perf_counter() - t0
+
+    results = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "opencv": cv2.__version__,
+        "model_load_s": round(model_load_s, 3),
+        "headless": args.headless,
+        "cases": [],
+    }
+
+    for res in args.resolutions:
+        sources = build_sources(args, RESOLUTIONS[res])
+        for config in args.configs:
+            detector = DrowsinessDetector(args.model, **CONFIGS[config])
+            for source, frames in sources.items():
+                name = f"{config}/{res}/{source}"
+                case = {"name": name, "config": config, "resolution": res, "source": source}
+                case.update(run_case(detector, frames, args.iterations, args.warmup,
+                                     draw=not args.headless))
+                results["cases"].append(case)
+                rss = case["peak_rss_mb"]
+                print(f"{name:<32} {case['fps']:8.1f} fps  p50 {case['p50_ms']:7.2f}  "
+                      f"p95 {case['p95_ms']:7.2f}  p99 {case['p99_ms']:7.2f} ms  "
+                      f"rss {'n/a' if rss is None else f'{rss:.0f} MB'}")
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nSaved results to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
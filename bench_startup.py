@@ -0,0 +1,124 @@
+# bench_startup.py
+"""
+Benchmark cold-start import time of the Streamlit app.
+
+    python bench_startup.py --output startup.json
+    python bench_startup.py --compare startup.json
+
+Each page's import set is loaded in a fresh interpreter with
+`python -X importtime`, several times. It reports the median wall time and
+import time per page and the heaviest top-level imports, and saves
+everything as JSON so runs can be compared. Keep PAGES in step with the
+imports main.py does up front and on each page.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+PAGES = {
+    # what every session imports before the login form is shown
+    "login": ["streamlit", "instrumentation", "db", "log_handler", "admin_scheduler"],
+    # added on the Detection page
+    "detection": ["cv2", "drowsiness", "pipeline", "preview_stream", "clip_recorder",
+                  "alert_coalescer"],
+    # added on the Admin Dashboard page
+    "admin": ["admin_dashboard"],
+}
+
+
+def page_modules(page):
+    """Modules loaded by the time `page` is shown (login's set is always included)."""
+    return PAGES["login"] + ([] if page == "login" else PAGES[page])
+
+
+def parse_importtime(stderr):
+    """Top-level import -> cumulative microseconds, from -X importtime output."""
+    top = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line.split("|", 2)
+        if name.startswith(" " * 3):  # nested import, counted in its parent
+            continue
+        top[name.strip()] = int(cumulative_us)
+    return top
+
+
+def run_page(page, repeat):
+    code = "; ".join(f"import {module}" for module in page_modules(page))
+    walls, imports = [], []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                              capture_output=True, text=True)
+        walls.append(time.perf_counter() - t0)
+        if proc.returncode != 0:
+            error = proc.stderr.strip().splitlines()[-1]
+            return {"page": page, "error": error}
+        top = parse_importtime(proc.stderr)
+        imports.append(top)
+
+    heaviest = sorted(imports[-1].items(), key=lambda item: item[1], reverse=True)[:10]
+    return {
+        "page": page,
+        "modules": page_modules(page),
+        "wall_ms": round(statistics.median(walls) * 1000, 1),
+        "import_ms": round(statistics.median(sum(top.values()) for top in imports) / 1000, 1),
+        "heaviest": [{"module": name, "ms": round(us / 1000, 1)} for name, us in heaviest],
+    }
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {case["page"]: case for case in json.load(f)["pages"]}
+
+    print(f"\nComparison with {baseline_path} (median wall ms):")
+    for case in results["pages"]:
+        old = baseline.get(case["page"])
+        if old is None or "error" in case or "error" in old:
+            continue
+        change = (case["wall_ms"] - old["wall_ms"]) / old["wall_ms"] * 100 if old["wall_ms"] else 0.0
+        print(f"  {case['page']:<12} {old['wall_ms']:8.1f} -> {case['wall_ms']:8.1f} ms  {change:+6.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark app cold-start import time.")
+    parser.add_argument("--pages", nargs="+", default=list(PAGES), choices=list(PAGES))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default="startup_results.json")
+    parser.add_argument("--compare", help="previous results JSON to compare against")
+    args = parser.parse_args()
+
+    results = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "pages": [],
+    }
+
+    for page in args.pages:
+        case = run_page(page, args.repeat)
+        results["pages"].append(case)
+        if "error" in case:
+            print(f"{page:<12} failed: {case['error']}")
+            continue
+        top = ", ".join(f"{item['module']} {item['ms']:.0f}" for item in case["heaviest"][:3])
+        print(f"{page:<12} wall {case['wall_ms']:8.1f} ms  imports {case['import_ms']:8.1f} ms  ({top})")
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nSaved results to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
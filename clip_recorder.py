@@ -0,0 +1,272 @@
+# clip_recorder.py
+"""
+Pre/post-event video clips for Drowsy events.
+
+    recorder = ClipRecorder(user_id=user_id)
+    pipeline = DetectionPipeline(cap, detector, recorder=recorder, ...)
+    clip_id = recorder.trigger()          # from the result handler
+    log_event(ear, "Drowsy", user_id, clip_id)
+
+Every analyzed frame (at most `fps` per second) is scaled into a ring
+buffer that holds the last `pre_seconds + post_seconds` of video. The ring
+and the clip buffers are allocated once, on the first frame, so recording
+does no per-frame allocation and memory use is fixed (about 52 MB for the
+ring at the defaults, plus the same per clip buffer).
+
+trigger() marks an event. When `post_seconds` of further frames have been
+recorded, the clip's frames are copied out of the ring into a free clip
+buffer and handed to the background ClipWriter, which encodes the MP4 and
+stores its metadata in the clips table; logs.clip_id links log rows to it.
+Events during an open clip join that clip. If every clip buffer is still
+being encoded the clip is dropped (and recorded as such) rather than
+waiting.
+
+add() and trigger() are called from the analysis thread only.
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+import instrumentation
+from db import get_setting, record_clip
+
+CLIP_DIR = "clips"
+PRE_SECONDS = 5
+POST_SECONDS = 5
+CLIP_FPS = 10
+CLIP_WIDTH = 480
+MAX_QUEUE = 4
+CODECS = ("avc1", "mp4v")
+
+
+class ClipRecorder:
+    def __init__(self, pre_seconds=None, post_seconds=None, fps=None, width=None,
+                 user_id=None, buffers=1, writer=None):
+        if pre_seconds is None:
+            pre_seconds = get_setting("clip_pre_seconds", PRE_SECONDS)
+        if post_seconds is None:
+            post_seconds = get_setting("clip_post_seconds", POST_SECONDS)
+        self.pre_seconds = float(pre_seconds)
+        self.post_seconds = float(post_seconds)
+        self.fps = float(CLIP_FPS if fps is None else fps)
+        self.width = int(CLIP_WIDTH if width is None else width)
+        self.user_id = user_id
+        self.writer = writer or get_clip_writer()
+
+        self.pre_frames = int(self.pre_seconds * self.fps)
+        self.post_frames = max(int(self.post_seconds * self.fps), 1)
+        self.capacity = self.pre_frames + self.post_frames
+        self.buffer_count = buffers
+
+        self.ring = None
+        self.times = np.zeros(self.capacity, dtype=np.float64)
+        self.free = queue.Queue()
+        self.count = 0          # frames written to the ring so far
+        self.next_ts = 0.0
+        self.open = None        # clip waiting for its post-event frames
+
+        self.clips = 0
+        self.dropped = 0
+
+    def _allocate(self, frame):
+        h, w = frame.shape[:2]
+        if w > self.width:
+            h, w = int(h * self.width / w), self.width
+        self.size = (w & ~1, h & ~1)  # even dimensions keep video encoders happy
+        shape = (self.capacity, self.size[1], self.size[0], 3)
+        self.ring = np.empty(shape, dtype=np.uint8)
+        for _ in range(self.buffer_count):
+            self.free.put(np.empty(shape, dtype=np.uint8))
+
+    def add(self, frame, ts=None):
+        """Record a frame if the clip frame rate allows it."""
+        ts = time.time() if ts is None else ts
+        if ts < self.next_ts:
+            return
+        self.next_ts = ts + 1.0 / self.fps
+        if self.ring is None:
+            self._allocate(frame)
+
+        with instrumentation.stage("clip_record"):
+            slot = self.count % self.capacity
+            if frame.shape[1::-1] == self.size:
+                np.copyto(self.ring[slot], frame)
+            else:
+                cv2.resize(frame, self.size, dst=self.ring[slot], interpolation=cv2.INTER_AREA)
+            self.times[slot] = ts
+            self.count += 1
+
+        if self.open is not None and self.count >= self.open["end_count"]:
+            self._finish()
+
+    def trigger(self, ts=None):
+        """Mark an event; returns the id of the clip that will contain it."""
+        if self.open is None:
+            self.open = {
+                "id": uuid.uuid4().hex[:12],
+                "event_ts": time.time() if ts is None else ts,
+                "start_count": max(self.count - self.pre_frames, 0),
+                "end_count": self.count + self.post_frames,
+            }
+        return self.open["id"]
+
+    def flush(self, wait=5.0):
+        """
+        Save the open clip with the frames recorded so far (e.g. on stop),
+        waiting up to `wait` seconds for a clip buffer to come free.
+        """
+        if self.open is not None:
+            self._finish(wait)
+
+    def _finish(self, wait=0):
+        clip, self.open = self.open, None
+        # frames older than the ring's capacity have been overwritten already
+        start = max(clip["start_count"], self.count - self.capacity)
+        frames = self.count - start
+        meta = {
+            "id": clip["id"],
+            "user_id": self.user_id,
+            "event_ts": clip["event_ts"],
+            "frames": frames,
+            "fps": self.fps,
+        }
+        if frames <= 0:
+            meta["status"] = "empty"
+            self.writer.submit(meta)
+            return
+
+        try:
+            buf = self.free.get(timeout=wait) if wait else self.free.get_nowait()
+        except queue.Empty:
+            self.dropped += 1
+            meta["status"] = "dropped"
+            meta["error"] = "all clip buffers busy"
+            self.writer.submit(meta)
+            return
+
+        with instrumentation.stage("clip_copy"):
+            first = start % self.capacity
+            head = min(frames, self.capacity - first)
+            buf[:head] = self.ring[first:first + head]
+            buf[head:frames] = self.ring[:frames - head]
+        meta["start_ts"] = self.times[first]
+        meta["end_ts"] = self.times[(self.count - 1) % self.capacity]
+        meta["width"], meta["height"] = self.size
+
+        if self.writer.submit(meta, buf[:frames], release=lambda: self.free.put(buf)):
+            self.clips += 1
+        else:
+            self.dropped += 1
+            self.free.put(buf)
+
+    def stats(self):
+        return {
+            "clips": self.clips,
+            "dropped": self.dropped,
+            "recording": self.open is not None,
+            "buffer_mb": round(self.ring.nbytes * (1 + self.buffer_count) / 2**20, 1)
+            if self.ring is not None else 0.0,
+        }
+
+
+class ClipWriter:
+    """Encodes clips to MP4 and records their metadata on a background thread."""
+
+    def __init__(self, max_queue=MAX_QUEUE):
+        self.queue = queue.Queue(max_queue)
+        self.written = 0
+        self.failed = 0
+        self.last_encode_ms = 0.0
+        self.thread = threading.Thread(target=self._run, name="clip-writer", daemon=True)
+        self.thread.start()
+
+    def submit(self, meta, frames=None, release=None):
+        """Queue a clip (frames=None records metadata only); False if the queue is full."""
+        try:
+            self.queue.put_nowait((meta, frames, release))
+            return True
+        except queue.Full:
+            return False
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                return
+            meta, frames, release = item
+            try:
+                if frames is not None:
+                    self._encode(meta, frames)
+            except Exception as e:
+                self.failed += 1
+                meta["status"], meta["error"] = "failed", str(e)
+                print(f"⚠️ Failed to save clip {meta['id']}: {e}")
+            finally:
+                if release is not None:
+                    release()
+            try:
+                record_clip(meta)
+            except Exception as e:
+                print(f"⚠️ Failed to record clip {meta['id']}: {e}")
+            self.queue.task_done()
+
+    def _encode(self, meta, frames):
+        start = time.perf_counter()
+        directory = get_setting("clip_dir", CLIP_DIR)
+        os.makedirs(directory, exist_ok=True)
+        stamp = datetime.fromtimestamp(meta["event_ts"]).strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(directory, f"clip-{stamp}-{meta['id']}.mp4")
+
+        # H.264 plays in browsers but is missing from many OpenCV builds
+        for codec in CODECS:
+            writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*codec), meta["fps"],
+                                     (meta["width"], meta["height"]))
+            if writer.isOpened():
+                break
+        else:
+            raise RuntimeError(f"cannot open video writer for {path}")
+        try:
+            for frame in frames:
+                writer.write(frame)
+        finally:
+            writer.release()
+
+        meta["path"] = path
+        meta["size_bytes"] = os.path.getsize(path)
+        meta["status"] = "saved"
+        self.written += 1
+        self.last_encode_ms = (time.perf_counter() - start) * 1000
+
+    def close(self, timeout=10.0):
+        self.queue.put(None)
+        self.thread.join(timeout)
+
+    def stats(self):
+        return {
+            "pending": self.queue.qsize(),
+            "written": self.written,
+            "failed": self.failed,
+            "last_encode_ms": self.last_encode_ms,
+        }
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_clip_writer():
+    """The process-wide clip writer, started on first use."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = ClipWriter()
+            atexit.register(_writer.close)
+        return _writer
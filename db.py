@@ -1,16 +1,122 @@
 import sqlite3
-from datetime import datetime
+from datetime import datetime, timedelta
 import contextlib
+import threading
+import time
 
 DB_NAME = "drowsiness_logs.db"
 
+# Bumped whenever init_db has to upgrade an existing database
+SCHEMA_VERSION = 3
+# the version 3 upgrade backfills logs.ts in short transactions with a
+# pause in between, so other processes' writes are not held up
+BACKFILL_BATCH = 5000
+BACKFILL_PAUSE = 0.05
+
+# Log times are stored in logs.ts as integer Unix epoch seconds. Rows written
+# before that only have the legacy local-time `timestamp` text; this
+# expression yields an epoch for either kind (until the version 3 upgrade
+# has backfilled ts).
+def log_epoch_sql(row):
+    return (f"COALESCE({row}.ts, CAST(strftime('%s', substr({row}.timestamp, 1, 19), 'utc') "
+            f"AS INTEGER))")
+
+# one long-lived connection per thread, opened on first use
+_local = threading.local()
+
+PRAGMAS = (
+    # only takes effect on a new database (must precede the WAL switch); lets
+    # retention shrink the file in steps. Older databases: see retention.py
+    "PRAGMA auto_vacuum=INCREMENTAL",
+    "PRAGMA journal_mode=WAL",      # readers no longer block on writers
+    "PRAGMA synchronous=NORMAL",    # durable at checkpoints, no fsync per commit
+    "PRAGMA busy_timeout=10000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-8000",      # 8 MB page cache
+)
+
+# Read-through cache for settings and the user list. Writes through this
+# module invalidate it at once; the TTL bounds staleness for writes made by
+# another process.
+CACHE_TTL = 30
+
+_cache_lock = threading.Lock()
+_cache = {}          # name -> (loaded_at, value)
+_generations = {}    # name -> invalidation count, so a load racing a write is not stored
+_subscribers = []
+
+def _cached(name, load):
+    now = time.monotonic()
+    with _cache_lock:
+        entry = _cache.get(name)
+        generation = _generations.setdefault(name, 0)
+    if entry is not None and now - entry[0] < CACHE_TTL:
+        return entry[1]
+    value = load()
+    with _cache_lock:
+        if _generations[name] == generation:
+            _cache[name] = (now, value)
+    return value
+
+def invalidate_cache(name=None):
+    """Drop one cache ("settings" / "users") or all of them."""
+    with _cache_lock:
+        for key in (list(_generations) if name is None else [name]):
+            _generations[key] = _generations.get(key, 0) + 1
+            _cache.pop(key, None)
+
+def subscribe(callback):
+    """
+    Call `callback(kind, key)` after every setting ("settings", key) or user
+    ("users", username) change made in this process. Returns an unsubscribe
+    function.
+    """
+    with _cache_lock:
+        _subscribers.append(callback)
+
+    def unsubscribe():
+        with _cache_lock:
+            if callback in _subscribers:
+                _subscribers.remove(callback)
+    return unsubscribe
+
+def _changed(kind, key):
+    invalidate_cache(kind)
+    with _cache_lock:
+        callbacks = list(_subscribers)
+    for callback in callbacks:
+        try:
+            callback(kind, key)
+        except Exception as e:
+            print(f"⚠️ Change subscriber failed: {e}")
+
+def _connect():
+    conn = sqlite3.connect(DB_NAME, timeout=10) # Added timeout for concurrency
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
 @contextlib.contextmanager
 def get_db_connection():
-    conn = sqlite3.connect(DB_NAME, timeout=10) # Added timeout for concurrency
+    """Yield this thread's connection; work left uncommitted after an error is rolled back."""
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.db_name != DB_NAME:
+        if conn is not None:
+            conn.close()
+        conn = _connect()
+        _local.conn, _local.db_name = conn, DB_NAME
     try:
         yield conn
-    finally:
+    except Exception:
+        conn.rollback()
+        raise
+
+def close_db_connection():
+    """Close the calling thread's connection (it is reopened on next use)."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
         conn.close()
+        _local.conn = None
 
 def init_db():
     with get_db_connection() as conn:
@@ -26,7 +132,7 @@ def init_db():
             )
         ''')
 
-        # Create logs table
+        # Create logs table (`timestamp` is legacy text, `ts` is epoch seconds)
         c.execute('''
             CREATE TABLE IF NOT EXISTS logs (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -34,10 +140,33 @@ def init_db():
                 user_id INTEGER,
                 ear REAL,
                 status TEXT,
+                ts INTEGER,
+                clip_id TEXT,
                 FOREIGN KEY (user_id) REFERENCES users(id)
             )
         ''')
 
+        c.execute("PRAGMA user_version")
+        version = c.fetchone()[0]
+        if version < SCHEMA_VERSION:
+            _upgrade_schema(c, version)
+
+        # Covers per-user counts, status filters and latest-time lookups
+        c.execute('''
+            CREATE INDEX IF NOT EXISTS idx_logs_user_status_epoch
+            ON logs (user_id, status, ts)
+        ''')
+
+        # Range scans over all users (admin log browser, exports)
+        c.execute('''
+            CREATE INDEX IF NOT EXISTS idx_logs_status_epoch
+            ON logs (status, ts)
+        ''')
+        c.execute('''
+            CREATE INDEX IF NOT EXISTS idx_logs_clip
+            ON logs (clip_id) WHERE clip_id IS NOT NULL
+        ''')
+
         # Create settings table
         c.execute('''
             CREATE TABLE IF NOT EXISTS settings (
@@ -46,14 +175,262 @@ def init_db():
             )
         ''')
 
+        # Last handled due time of each scheduled job
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS job_runs (
+                job TEXT PRIMARY KEY,
+                due_ts INTEGER,
+                run_ts INTEGER,
+                status TEXT,
+                error TEXT
+            )
+        ''')
+
+        # Stored results of incremental summary runs (see summary.py)
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS summary_periods (
+                day TEXT PRIMARY KEY,
+                first_id INTEGER,
+                last_id INTEGER,
+                total_logs INTEGER,
+                drowsy_logs INTEGER,
+                created_ts INTEGER
+            )
+        ''')
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS summary_user_counts (
+                day TEXT,
+                user_id INTEGER,
+                total_logs INTEGER,
+                drowsy_logs INTEGER,
+                PRIMARY KEY (day, user_id)
+            )
+        ''')
+        # before the first summary run, start the watermark at the newest
+        # existing log, so history is not reported as one day's new logs
+        c.execute('''
+            INSERT INTO summary_periods (day, first_id, last_id, total_logs, drowsy_logs, created_ts)
+            SELECT date('now', 'localtime'), COALESCE(MAX(id), 0) + 1, COALESCE(MAX(id), 0), 0, 0,
+                   CAST(strftime('%s', 'now') AS INTEGER)
+            FROM logs
+            HAVING NOT EXISTS (SELECT 1 FROM summary_periods)
+        ''')
+
+        # Pre/post-event video clips (see clip_recorder.py); logs.clip_id
+        # points here
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS clips (
+                id TEXT PRIMARY KEY,
+                user_id INTEGER,
+                event_ts REAL,
+                start_ts REAL,
+                end_ts REAL,
+                frames INTEGER,
+                fps REAL,
+                width INTEGER,
+                height INTEGER,
+                path TEXT,
+                size_bytes INTEGER,
+                status TEXT,
+                error TEXT
+            )
+        ''')
+
+        # Per-recipient notification results
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS notification_deliveries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                ts INTEGER,
+                channel TEXT,
+                recipient TEXT,
+                ok INTEGER,
+                attempt INTEGER,
+                error TEXT,
+                latency_ms REAL
+            )
+        ''')
+
+        needs_rebuild = _create_rollups(c)
+        # version 3 is only recorded once the ts backfill below has finished,
+        # so an interrupted backfill resumes on the next start
+        c.execute(f"PRAGMA user_version = {max(min(version, SCHEMA_VERSION), 2)}")
         conn.commit()
 
-def fetch_users():
+    if needs_rebuild:
+        rebuild_rollups()
+    # version 3: every row has ts, so readers can filter on the indexed column
+    if version < 3:
+        backfill_timestamps(BACKFILL_BATCH, BACKFILL_PAUSE)
+        with get_db_connection() as conn:
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+def _upgrade_schema(c, version):
+    """Bring a database created by an older version up to SCHEMA_VERSION."""
+    c.execute("PRAGMA table_info(logs)")
+    columns = {row[1] for row in c.fetchall()}
+
+    if version < 1:
+        if "ts" not in columns:
+            c.execute("ALTER TABLE logs ADD COLUMN ts INTEGER")
+
+        # text-timestamp indexes and rollups are replaced by epoch-based ones
+        c.execute("DROP INDEX IF EXISTS idx_logs_user_status_ts")
+        c.execute("DROP INDEX IF EXISTS idx_logs_status_ts")
+        for name in ROLLUP_TRIGGERS:
+            c.execute(f"DROP TRIGGER IF EXISTS {name}")
+        c.execute("DROP TABLE IF EXISTS user_stats")
+        c.execute("DROP TABLE IF EXISTS daily_stats")
+
+    # version 2: Drowsy log rows can reference a saved video clip
+    if "clip_id" not in columns:
+        c.execute("ALTER TABLE logs ADD COLUMN clip_id TEXT")
+
+    # version 3: the delete trigger no longer recomputes last_ts per row
+    if version < 3:
+        c.execute("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'trg_logs_rollup_delete'")
+        if c.fetchone():
+            c.execute("DROP TRIGGER trg_logs_rollup_delete")
+            c.execute(ROLLUP_TRIGGERS["trg_logs_rollup_delete"])
+
+# Rollup tables are kept current by triggers on logs, so stats readers never
+# scan the raw rows. Deletes do not touch user_stats.last_ts (a per-row MAX
+# would scan the user's logs for every deleted row); whoever deletes calls
+# refresh_last_ts() once per batch instead. Logs without a user are counted under user_id 0; days
+# are local-time 'YYYY-MM-DD'.
+ROLLUP_TRIGGERS = {
+    "trg_logs_rollup_insert": f'''
+        CREATE TRIGGER trg_logs_rollup_insert AFTER INSERT ON logs
+        BEGIN
+            INSERT INTO user_stats (user_id, total_logs, drowsy_logs, last_ts)
+            VALUES (COALESCE(NEW.user_id, 0), 1, NEW.status = 'Drowsy', {log_epoch_sql("NEW")})
+            ON CONFLICT (user_id) DO UPDATE SET
+                total_logs = total_logs + 1,
+                drowsy_logs = drowsy_logs + excluded.drowsy_logs,
+                last_ts = MAX(COALESCE(last_ts, 0), COALESCE(excluded.last_ts, 0));
+
+            INSERT INTO daily_stats (day, user_id, total_logs, drowsy_logs)
+            VALUES (date({log_epoch_sql("NEW")}, 'unixepoch', 'localtime'),
+                    COALESCE(NEW.user_id, 0), 1, NEW.status = 'Drowsy')
+            ON CONFLICT (day, user_id) DO UPDATE SET
+                total_logs = total_logs + 1,
+                drowsy_logs = drowsy_logs + excluded.drowsy_logs;
+        END
+    ''',
+    "trg_logs_rollup_delete": f'''
+        CREATE TRIGGER trg_logs_rollup_delete AFTER DELETE ON logs
+        BEGIN
+            UPDATE user_stats SET
+                total_logs = total_logs - 1,
+                drowsy_logs = drowsy_logs - (OLD.status = 'Drowsy')
+            WHERE user_id = COALESCE(OLD.user_id, 0);
+
+            UPDATE daily_stats SET
+                total_logs = total_logs - 1,
+                drowsy_logs = drowsy_logs - (OLD.status = 'Drowsy')
+            WHERE day = date({log_epoch_sql("OLD")}, 'unixepoch', 'localtime')
+              AND user_id = COALESCE(OLD.user_id, 0);
+        END
+    ''',
+}
+
+def _create_rollups(c):
+    """Create rollup tables/triggers; returns True if they have to be (re)filled."""
+    c.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+    existing = {row[0] for row in c.fetchall()}
+
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS user_stats (
+            user_id INTEGER PRIMARY KEY,
+            total_logs INTEGER NOT NULL DEFAULT 0,
+            drowsy_logs INTEGER NOT NULL DEFAULT 0,
+            last_ts INTEGER
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS daily_stats (
+            day TEXT,
+            user_id INTEGER,
+            total_logs INTEGER NOT NULL DEFAULT 0,
+            drowsy_logs INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, user_id)
+        )
+    ''')
+
+    missing = [name for name in ROLLUP_TRIGGERS if name not in existing]
+    for name in missing:
+        c.execute(ROLLUP_TRIGGERS[name])
+    return bool(missing) or "user_stats" not in existing or "daily_stats" not in existing
+
+def backfill_timestamps(batch_size=5000, pause=0.0):
+    """
+    Fill logs.ts from the legacy text `timestamp` in id ranges of
+    `batch_size`, one short transaction each. Returns the rows converted.
+    """
+    with get_db_connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT COALESCE(MIN(id), 0), COALESCE(MAX(id), 0) FROM logs WHERE ts IS NULL")
+        first, last = c.fetchone()
+
+    converted = 0
+    start = first - 1
+    while start < last:
+        end = start + batch_size
+        with get_db_connection() as conn:
+            c = conn.cursor()
+            c.execute(f"""
+                UPDATE logs SET ts = {log_epoch_sql("logs")}
+                WHERE id > ? AND id <= ? AND ts IS NULL AND timestamp IS NOT NULL
+            """, (start, end))
+            conn.commit()
+            converted += c.rowcount
+        start = end
+        if pause:
+            time.sleep(pause)
+
+    return converted
+
+def refresh_last_ts(c, deleted):
+    """
+    Recompute user_stats.last_ts after deleting logs given as (user_id, ts)
+    pairs. Only users whose latest log was among them need the MAX lookup.
+    """
+    newest = {}
+    for user_id, ts in deleted:
+        newest[user_id] = max(newest.get(user_id) or 0, ts or 0)
+    c.executemany(
+        "UPDATE user_stats SET last_ts = (SELECT MAX(ts) FROM logs WHERE user_id IS ?) "
+        "WHERE user_id = ? AND COALESCE(last_ts, 0) <= ?",
+        [(user_id, user_id or 0, ts) for user_id, ts in newest.items()]
+    )
+
+def rebuild_rollups():
+    """Recompute user_stats and daily_stats from the raw logs table."""
+    with get_db_connection() as conn:
+        c = conn.cursor()
+        c.execute("DELETE FROM user_stats")
+        c.execute("DELETE FROM daily_stats")
+        c.execute(f'''
+            INSERT INTO user_stats (user_id, total_logs, drowsy_logs, last_ts)
+            SELECT COALESCE(user_id, 0), COUNT(*), SUM(status = 'Drowsy'), MAX({log_epoch_sql("logs")})
+            FROM logs GROUP BY COALESCE(user_id, 0)
+        ''')
+        c.execute(f'''
+            INSERT INTO daily_stats (day, user_id, total_logs, drowsy_logs)
+            SELECT date({log_epoch_sql("logs")}, 'unixepoch', 'localtime') AS day,
+                   COALESCE(user_id, 0), COUNT(*), SUM(status = 'Drowsy')
+            FROM logs GROUP BY day, COALESCE(user_id, 0)
+        ''')
+        conn.commit()
+
+def _load_users():
     with get_db_connection() as conn:
         c = conn.cursor()
         c.execute("SELECT id, username, is_admin FROM users")
         return c.fetchall()
 
+def fetch_users():
+    return list(_cached("users", _load_users))
+
 def authenticate_user(username, password):
     with get_db_connection() as conn:
         c = conn.cursor()
@@ -66,15 +443,17 @@ def add_user(username, password, is_admin=0):
             c = conn.cursor()
             c.execute("INSERT INTO users (username, password, is_admin) VALUES (?, ?, ?)", (username, password, is_admin))
             conn.commit()
-            return True
     except sqlite3.IntegrityError:
         return False
+    _changed("users", username)
+    return True
 
 def delete_user(username):
     with get_db_connection() as conn:
         c = conn.cursor()
         c.execute("DELETE FROM users WHERE username = ?", (username,))
         conn.commit()
+    _changed("users", username)
 
 def ensure_default_admin():
     if not authenticate_user("admin", "admin123"):
@@ -83,28 +462,27 @@ def ensure_default_admin():
 def log_detection(user_id, ear, status):
     with get_db_connection() as conn:
         c = conn.cursor()
-        c.execute("INSERT INTO logs (timestamp, user_id, ear, status) VALUES (?, ?, ?, ?)",
-                  (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), user_id, ear, status))
+        c.execute("INSERT INTO logs (ts, user_id, ear, status) VALUES (?, ?, ?, ?)",
+                  (int(time.time()), user_id, ear, status))
         conn.commit()
 
 def fetch_user_stats(user_id):
     with get_db_connection() as conn:
         c = conn.cursor()
-
-        c.execute("SELECT username FROM users WHERE id=?", (user_id,))
+        c.execute("""
+            SELECT u.username,
+                   COALESCE(s.total_logs, 0),
+                   COALESCE(s.drowsy_logs, 0),
+                   datetime(s.last_ts, 'unixepoch', 'localtime')
+            FROM users u
+            LEFT JOIN user_stats s ON s.user_id = u.id
+            WHERE u.id = ?
+        """, (user_id,))
         res = c.fetchone()
-        if not res:
-            return None # Handle case where user doesn't exist?
-        username = res[0]
-
-        c.execute("SELECT COUNT(*) FROM logs WHERE user_id=?", (user_id,))
-        total_logs = c.fetchone()[0]
 
-        c.execute("SELECT COUNT(*) FROM logs WHERE user_id=? AND status='Drowsy'", (user_id,))
-        drowsy_logs = c.fetchone()[0]
-
-        c.execute("SELECT MAX(timestamp) FROM logs WHERE user_id=?", (user_id,))
-        last_login = c.fetchone()[0]
+    if not res:
+        return None # Handle case where user doesn't exist?
+    username, total_logs, drowsy_logs, last_login = res
 
     return {
         "username": username,
@@ -113,15 +491,154 @@ def fetch_user_stats(user_id):
         "last_login": last_login
     }
 
-def get_setting(key, default=None):
+def fetch_totals():
+    """(total logs, drowsy logs) across all users, from the rollups."""
+    with get_db_connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT COALESCE(SUM(total_logs), 0), COALESCE(SUM(drowsy_logs), 0) FROM user_stats")
+        return c.fetchone()
+
+def fetch_top_users(limit=3):
+    """[(username, log count)] for the users with the most logs."""
+    with get_db_connection() as conn:
+        c = conn.cursor()
+        c.execute("""
+            SELECT u.username, COALESCE(s.total_logs, 0) AS logs
+            FROM users u
+            LEFT JOIN user_stats s ON s.user_id = u.id
+            ORDER BY logs DESC
+            LIMIT ?
+        """, (limit,))
+        return c.fetchall()
+
+def fetch_daily_stats(start_day=None, end_day=None):
+    """[(day, user_id, total logs, drowsy logs)] with day as 'YYYY-MM-DD', inclusive range."""
+    with get_db_connection() as conn:
+        c = conn.cursor()
+        c.execute("""
+            SELECT day, user_id, total_logs, drowsy_logs
+            FROM daily_stats
+            WHERE day >= COALESCE(?, '') AND day <= COALESCE(?, '9999-12-31')
+              AND total_logs > 0
+            ORDER BY day
+        """, (start_day, end_day))
+        return c.fetchall()
+
+def logs_version():
+    """Cheap token that changes whenever logs are inserted or deleted."""
     with get_db_connection() as conn:
         c = conn.cursor()
-        c.execute("SELECT value FROM settings WHERE key=?", (key,))
-        result = c.fetchone()
-        return result[0] if result else default
+        c.execute("""
+            SELECT (SELECT COALESCE(MAX(id), 0) FROM logs),
+                   (SELECT COALESCE(SUM(total_logs), 0) FROM user_stats)
+        """)
+        return c.fetchone()
+
+def day_bounds(start_day, end_day):
+    """Epoch range [start, end) covering two local 'YYYY-MM-DD' days inclusive."""
+    start = datetime.strptime(start_day, "%Y-%m-%d")
+    end = datetime.strptime(end_day, "%Y-%m-%d") + timedelta(days=1)
+    return int(start.timestamp()), int(end.timestamp())
+
+# Selected instead of the raw columns so readers get a local time string
+LOG_SELECT = "id, datetime(ts, 'unixepoch', 'localtime') AS timestamp, user_id, ear, status"
+
+def fetch_logs_range(start_day, end_day, status="Drowsy", limit=None, offset=0):
+    """
+    Log rows (id, timestamp, user_id, ear, status) with the given status
+    between two 'YYYY-MM-DD' days inclusive, newest first.
+    """
+    start_ts, end_ts = day_bounds(start_day, end_day)
+    with get_db_connection() as conn:
+        c = conn.cursor()
+        c.execute(f"""
+            SELECT {LOG_SELECT}
+            FROM logs
+            WHERE status = ? AND ts >= ? AND ts < ?
+            ORDER BY ts DESC
+            LIMIT ? OFFSET ?
+        """, (status, start_ts, end_ts, -1 if limit is None else limit, offset))
+        return c.fetchall()
+
+def record_deliveries(rows):
+    """Store (channel, recipient, ok, attempt, error, latency_ms) delivery results."""
+    now = int(time.time())
+    with get_db_connection() as conn:
+        conn.executemany(
+            "INSERT INTO notification_deliveries (ts, channel, recipient, ok, attempt, error, latency_ms) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(now,) + tuple(row) for row in rows]
+        )
+        conn.commit()
+
+def fetch_recent_deliveries(limit=50):
+    with get_db_connection() as conn:
+        c = conn.cursor()
+        c.execute("""
+            SELECT datetime(ts, 'unixepoch', 'localtime'), channel, recipient, ok, attempt, error, latency_ms
+            FROM notification_deliveries
+            ORDER BY id DESC
+            LIMIT ?
+        """, (limit,))
+        return c.fetchall()
+
+CLIP_COLUMNS = ("id", "user_id", "event_ts", "start_ts", "end_ts", "frames", "fps",
+                "width", "height", "path", "size_bytes", "status", "error")
+
+def record_clip(clip):
+    """Store clip metadata given as a dict with CLIP_COLUMNS keys."""
+    with get_db_connection() as conn:
+        conn.execute(
+            f"INSERT OR REPLACE INTO clips ({', '.join(CLIP_COLUMNS)}) "
+            f"VALUES ({', '.join('?' * len(CLIP_COLUMNS))})",
+            [clip.get(column) for column in CLIP_COLUMNS]
+        )
+        conn.commit()
+
+def fetch_recent_clips(limit=20):
+    """Latest clips with the username and the number of log rows linked to each."""
+    with get_db_connection() as conn:
+        c = conn.cursor()
+        c.execute("""
+            SELECT c.id, datetime(c.event_ts, 'unixepoch', 'localtime'), u.username,
+                   c.status, c.frames, c.size_bytes, c.path,
+                   (SELECT COUNT(*) FROM logs WHERE logs.clip_id = c.id)
+            FROM clips c
+            LEFT JOIN users u ON u.id = c.user_id
+            ORDER BY c.event_ts DESC
+            LIMIT ?
+        """, (limit,))
+        return c.fetchall()
+
+def get_job_run(job):
+    with get_db_connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT due_ts, run_ts, status, error FROM job_runs WHERE job=?", (job,))
+        row = c.fetchone()
+    if not row:
+        return None
+    return {"due_ts": row[0], "run_ts": row[1], "status": row[2], "error": row[3]}
+
+def record_job_run(job, due_ts, status, error=None):
+    with get_db_connection() as conn:
+        c = conn.cursor()
+        c.execute("INSERT OR REPLACE INTO job_runs (job, due_ts, run_ts, status, error) VALUES (?, ?, ?, ?, ?)",
+                  (job, due_ts, int(time.time()), status, error))
+        conn.commit()
+
+def _load_settings():
+    with get_db_connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT key, value FROM settings")
+        return dict(c.fetchall())
+
+def get_setting(key, default=None):
+    value = _cached("settings", _load_settings).get(key)
+    return value if value is not None else default
 
 def set_setting(key, value):
     with get_db_connection() as conn:
         c = conn.cursor()
         c.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, value))
         conn.commit()
+    _changed("settings", key)
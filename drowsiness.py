@@ -1,82 +1,245 @@
+import threading
+from collections import namedtuple
+
 import cv2
 import dlib
 import numpy as np
 from imutils import face_utils
-from scipy.spatial import distance
+
+import metrics
+from instrumentation import stage
+
+# faces: list of (68x2 landmark array, below-threshold flag) per analyzed face
+Analysis = namedtuple("Analysis", ["status", "ear", "mar", "faces"])
+
+_predictors = {}
+_predictors_lock = threading.Lock()
+
+
+def load_shape_predictor(shape_predictor_path):
+    """
+    Load a dlib shape predictor once per process. The model is only read
+    during prediction, so one instance is shared by every detector.
+    """
+    with _predictors_lock:
+        predictor = _predictors.get(shape_predictor_path)
+        if predictor is None:
+            predictor = dlib.shape_predictor(shape_predictor_path)
+            _predictors[shape_predictor_path] = predictor
+        return predictor
+
 
 class DrowsinessDetector:
-    def __init__(self, shape_predictor_path, ear_thresh=0.25, mar_thresh=0.5, frame_check=20):
+    def __init__(self, shape_predictor_path, ear_thresh=0.25, mar_thresh=0.5, frame_check=20,
+                 track=False, detect_interval=10, track_quality=7.0,
+                 detect_scale=1.0, roi_margin=0.25):
         self.ear_thresh = ear_thresh
         self.mar_thresh = mar_thresh
         self.frame_check = frame_check
         self.frame_counter = 0
 
+        # tracking mode: run the HOG detector every `detect_interval` frames
+        # (or when the tracker's confidence drops below `track_quality`) and
+        # follow the face with a correlation tracker in between
+        self.track = track
+        self.detect_interval = detect_interval
+        self.track_quality = track_quality
+        self.tracker = None
+        self.frames_since_detect = 0
+
+        # multi-resolution pipeline: faces are searched on a frame downscaled
+        # by `detect_scale`, landmarks are predicted on a full-resolution crop
+        # of the face box grown by `roi_margin`
+        self.detect_scale = detect_scale
+        self.roi_margin = roi_margin
+        self._frame_shape = None
+        self._small = None
+        self._detect_gray = None
+        self._roi_buf = None
+
+        # the HOG detector is small but keeps scratch state while scanning,
+        # so each detector owns one; the large landmark model is shared
         self.detector = dlib.get_frontal_face_detector()
-        self.predictor = dlib.shape_predictor(shape_predictor_path)
+        self.predictor = load_shape_predictor(shape_predictor_path)
 
         # landmark indexes for eyes and mouth
         (self.lStart, self.lEnd) = face_utils.FACIAL_LANDMARKS_IDXS["left_eye"]
         (self.rStart, self.rEnd) = face_utils.FACIAL_LANDMARKS_IDXS["right_eye"]
         (self.mStart, self.mEnd) = face_utils.FACIAL_LANDMARKS_IDXS["mouth"]
 
+    def update_settings(self, ear_thresh=None, mar_thresh=None, frame_check=None,
+                        track=None, detect_scale=None):
+        """Change thresholds/pipeline options in place without reloading models."""
+        if ear_thresh is not None:
+            self.ear_thresh = ear_thresh
+        if mar_thresh is not None:
+            self.mar_thresh = mar_thresh
+        if frame_check is not None:
+            self.frame_check = frame_check
+        if track is not None and track != self.track:
+            self.track = track
+            self.tracker = None
+        if detect_scale is not None and detect_scale != self.detect_scale:
+            self.detect_scale = detect_scale
+            self._frame_shape = None  # reallocate buffers on the next frame
+
+    def reset(self):
+        """Forget the tracked face and the consecutive-frame counter."""
+        self.frame_counter = 0
+        self.tracker = None
+        self.frames_since_detect = 0
+
     def eye_aspect_ratio(self, eye):
-        A = distance.euclidean(eye[1], eye[5])
-        B = distance.euclidean(eye[2], eye[4])
-        C = distance.euclidean(eye[0], eye[3])
-        ear = (A + B) / (2.0 * C)
-        return ear
+        return float(metrics.eye_aspect_ratio(eye))
 
     def mouth_aspect_ratio(self, mouth):
-        A = distance.euclidean(mouth[2], mouth[10])  # vertical
-        B = distance.euclidean(mouth[4], mouth[8])   # vertical
-        C = distance.euclidean(mouth[0], mouth[6])   # horizontal
-        mar = (A + B) / (2.0 * C)
-        return mar
-
-    def analyze_frame(self, frame):
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return float(metrics.mouth_aspect_ratio(mouth))
+
+    def _allocate_buffers(self, frame):
+        """(Re)allocate the per-resolution work buffers reused across frames."""
+        h, w = frame.shape[:2]
+        self._frame_shape = frame.shape
+        if self.detect_scale < 1.0:
+            size = (max(1, int(w * self.detect_scale)), max(1, int(h * self.detect_scale)))
+            self._small = np.empty((size[1], size[0], 3), dtype=np.uint8)
+            self._detect_gray = np.empty((size[1], size[0]), dtype=np.uint8)
+        else:
+            self._small = None
+            self._detect_gray = np.empty((h, w), dtype=np.uint8)
+        # flat so any ROI size can be viewed as a contiguous 2-D image
+        self._roi_buf = np.empty(h * w, dtype=np.uint8)
+        # tracker coordinates belong to the old resolution
+        self.tracker = None
+
+    def _detection_image(self, frame):
+        if self._frame_shape != frame.shape:
+            self._allocate_buffers(frame)
+
+        if self._small is not None:
+            cv2.resize(frame, (self._small.shape[1], self._small.shape[0]),
+                       dst=self._small, interpolation=cv2.INTER_AREA)
+            cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=self._detect_gray)
+        else:
+            cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self._detect_gray)
+        return self._detect_gray
+
+    def _to_full_resolution(self, rect):
+        if self._small is None:
+            return rect
+        s = self.detect_scale
+        return dlib.rectangle(int(rect.left() / s), int(rect.top() / s),
+                              int(rect.right() / s), int(rect.bottom() / s))
+
+    def _predict_landmarks(self, frame, rect):
+        """Run the shape predictor on a gray crop around `rect` (full-res coords)."""
+        h, w = frame.shape[:2]
+        mx = int(rect.width() * self.roi_margin)
+        my = int(rect.height() * self.roi_margin)
+        x0, y0 = max(0, rect.left() - mx), max(0, rect.top() - my)
+        x1, y1 = min(w, rect.right() + mx + 1), min(h, rect.bottom() + my + 1)
+        if x1 <= x0 or y1 <= y0:
+            return None
+
+        roi = self._roi_buf[:(y1 - y0) * (x1 - x0)].reshape(y1 - y0, x1 - x0)
+        cv2.cvtColor(frame[y0:y1, x0:x1], cv2.COLOR_BGR2GRAY, dst=roi)
+
+        local = dlib.rectangle(rect.left() - x0, rect.top() - y0,
+                               rect.right() - x0, rect.bottom() - y0)
+        shape = face_utils.shape_to_np(self.predictor(roi, local))
+        shape[:, 0] += x0
+        shape[:, 1] += y0
+        return shape
+
+    def locate_faces(self, gray):
+        """Return face rectangles (in detection-image coordinates) to run the landmark predictor on."""
+        if not self.track:
+            return self.detector(gray, 0)
+
+        if self.tracker is not None and self.frames_since_detect < self.detect_interval:
+            quality = self.tracker.update(gray)
+            if quality >= self.track_quality:
+                self.frames_since_detect += 1
+                pos = self.tracker.get_position()
+                return [dlib.rectangle(int(pos.left()), int(pos.top()),
+                                       int(pos.right()), int(pos.bottom()))]
+
+        # (re)detect and start following the largest face, i.e. the driver
         rects = self.detector(gray, 0)
+        self.frames_since_detect = 0
+        if len(rects) == 0:
+            self.tracker = None
+            return []
+
+        face = max(rects, key=lambda r: r.area())
+        self.tracker = dlib.correlation_tracker()
+        self.tracker.start_track(gray, face)
+        return [face]
+
+    def analyze(self, frame):
+        """
+        Run detection and update the drowsiness state without touching the frame.
+        Returns an Analysis; pass it to `annotate` to draw the overlay.
+        """
+        with stage("grayscale"):
+            gray = self._detection_image(frame)
+        with stage("detect"):
+            rects = self.locate_faces(gray)
 
         status = "Active"
         ear, mar = 0, 0
+        faces = []
 
         for rect in rects:
-            shape = self.predictor(gray, rect)
-            shape = face_utils.shape_to_np(shape)
-
-            # extract eye and mouth coords
-            leftEye = shape[self.lStart:self.lEnd]
-            rightEye = shape[self.rStart:self.rEnd]
-            mouth = shape[self.mStart:self.mEnd]
+            with stage("landmarks"):
+                shape = self._predict_landmarks(frame, self._to_full_resolution(rect))
+            if shape is None:
+                continue
 
-            ear = (self.eye_aspect_ratio(leftEye) + self.eye_aspect_ratio(rightEye)) / 2.0
-            mar = self.mouth_aspect_ratio(mouth)
+            with stage("metrics"):
+                ear, mar = metrics.ear_mar(shape)
+                ear, mar = float(ear), float(mar)
 
-            # draw contours
-            leftEyeHull = cv2.convexHull(leftEye)
-            rightEyeHull = cv2.convexHull(rightEye)
-            mouthHull = cv2.convexHull(mouth)
-
-            color = (0, 255, 0)  # green default
-            if ear < self.ear_thresh or mar > self.mar_thresh:
+            flagged = ear < self.ear_thresh or mar > self.mar_thresh
+            if flagged:
                 self.frame_counter += 1
-                color = (0, 0, 255)  # red
                 if self.frame_counter >= self.frame_check:
                     status = "Drowsy"
             else:
                 self.frame_counter = 0
+            faces.append((shape, flagged))
+
+        return Analysis(status, ear, mar, faces)
+
+    def annotate(self, frame, analysis):
+        """Draw eye/mouth contours and EAR/MAR/status text for an Analysis onto frame."""
+        if not analysis.faces:
+            return frame
+
+        with stage("draw"):
+            for shape, flagged in analysis.faces:
+                color = (0, 0, 255) if flagged else (0, 255, 0)  # red / green
+
+                # extract eye and mouth coords
+                leftEye = shape[self.lStart:self.lEnd]
+                rightEye = shape[self.rStart:self.rEnd]
+                mouth = shape[self.mStart:self.mEnd]
 
-            # draw eye and mouth contours
-            cv2.drawContours(frame, [leftEyeHull], -1, color, 1)
-            cv2.drawContours(frame, [rightEyeHull], -1, color, 1)
-            cv2.drawContours(frame, [mouthHull], -1, color, 1)
+                # draw eye and mouth contours
+                cv2.drawContours(frame, [cv2.convexHull(leftEye)], -1, color, 1)
+                cv2.drawContours(frame, [cv2.convexHull(rightEye)], -1, color, 1)
+                cv2.drawContours(frame, [cv2.convexHull(mouth)], -1, color, 1)
 
             # EAR / MAR text
-            cv2.putText(frame, f"EAR: {ear:.2f}", (10, 30),
+            cv2.putText(frame, f"EAR: {analysis.ear:.2f}", (10, 30),
                         cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
-            cv2.putText(frame, f"MAR: {mar:.2f}", (10, 60),
+            cv2.putText(frame, f"MAR: {analysis.mar:.2f}", (10, 60),
                         cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
-            cv2.putText(frame, f"Status: {status}", (10, 90),
+            cv2.putText(frame, f"Status: {analysis.status}", (10, 90),
                         cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
+        return frame
 
-        return frame, status, ear, mar
+    def analyze_frame(self, frame, draw=True):
+        analysis = self.analyze(frame)
+        if draw:
+            self.annotate(frame, analysis)
+        return frame, analysis.status, analysis.ear, analysis.mar
@@ -3,6 +3,9 @@
 # email_alert.py
 import smtplib
 import os
+import queue
+import threading
+import time
 from dotenv import load_dotenv
 from email.mime.text import MIMEText
 
@@ -16,6 +19,12 @@ PASSWORD=os.getenv("PASSWORD")
 # Choose email service: 'gmail', 'outlook', 'yahoo'
 EMAIL_SERVICE = "gmail"
 
+SMTP_TIMEOUT = 15
+# kept-open sessions, so several recipients can be mailed concurrently
+SMTP_POOL_SIZE = 4
+# check an idle connection with NOOP before reusing it
+IDLE_CHECK_SECONDS = 60
+
 def get_smtp_details(service):
     if service == "gmail":
         return ("smtp.gmail.com", 465, True)
@@ -26,23 +35,112 @@ def get_smtp_details(service):
     else:
         raise ValueError("Unsupported email service")
 
-def send_email_alert(status):
-    try:
-        smtp_server, port, use_ssl = get_smtp_details(EMAIL_SERVICE)
-        msg = MIMEText(f"⚠️ Alert! Drowsiness detected. Status: {status}")
-        msg['Subject'] = "Drowsiness Alert"
-        msg['From'] = SENDER_EMAIL
-        msg['To'] = ADMIN_EMAIL
+def _connection_error(e):
+    """True for failures to reach the server, as opposed to SMTP replies (SMTPException is an OSError)."""
+    return isinstance(e, smtplib.SMTPServerDisconnected) or (
+        isinstance(e, OSError) and not isinstance(e, smtplib.SMTPException))
+
+class SMTPConnection:
+    """A logged-in SMTP session that is kept open and reused across messages."""
+
+    def __init__(self, service=EMAIL_SERVICE):
+        self.service = service
+        self.server = None
+        self.last_used = 0
+        self.lock = threading.Lock()
 
+    def _connect(self):
+        smtp_server, port, use_ssl = get_smtp_details(self.service)
         if use_ssl:
-            server = smtplib.SMTP_SSL(smtp_server, port)
+            server = smtplib.SMTP_SSL(smtp_server, port, timeout=SMTP_TIMEOUT)
         else:
-            server = smtplib.SMTP(smtp_server, port)
+            server = smtplib.SMTP(smtp_server, port, timeout=SMTP_TIMEOUT)
             server.starttls()
-
         server.login(SENDER_EMAIL, PASSWORD)
-        server.sendmail(SENDER_EMAIL, ADMIN_EMAIL, msg.as_string())
-        server.quit()
+        return server
+
+    def _alive(self):
+        if time.time() - self.last_used < IDLE_CHECK_SECONDS:
+            return True
+        try:
+            return self.server.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):  # a reset socket raises OSError
+            return False
+
+    def send(self, recipient, msg):
+        """
+        Send a message, reconnecting once only where nothing can have been
+        sent: connecting failed, or a kept-open session turned out to be
+        dropped. Anything else (a rejected recipient, a DATA error, a timeout
+        after DATA) is raised unchanged, so a message never goes out twice.
+        Connection errors once sendmail has started are marked
+        `delivery_unknown`, since the message may have arrived.
+        """
+        with self.lock:
+            for attempt in range(2):
+                try:
+                    reused = self.server is not None and self._alive()
+                    if not reused:
+                        self.close_locked()
+                        self.server = self._connect()
+                except Exception as e:
+                    self.close_locked()
+                    if attempt or not _connection_error(e):
+                        raise
+                    continue
+
+                try:
+                    self.server.sendmail(SENDER_EMAIL, recipient, msg.as_string())
+                    self.last_used = time.time()
+                    return
+                except smtplib.SMTPServerDisconnected as e:
+                    self.close_locked()
+                    if attempt or not reused:
+                        e.delivery_unknown = True
+                        raise
+                except smtplib.SMTPException:
+                    raise  # the server answered; the session is still usable
+                except OSError as e:
+                    self.close_locked()  # socket state unknown mid-transaction
+                    e.delivery_unknown = True
+                    raise
+
+    def close_locked(self):
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.server = None
+
+    def close(self):
+        with self.lock:
+            self.close_locked()
+
+_pool = queue.Queue()
+for _ in range(SMTP_POOL_SIZE):
+    _pool.put(SMTPConnection())
+
+def deliver_email(body, subject="Drowsiness Alert", recipient=None):
+    """Send `body` as-is over a pooled SMTP connection; raises on failure."""
+    recipient = recipient or ADMIN_EMAIL
+    msg = MIMEText(body)
+    msg['Subject'] = subject
+    msg['From'] = SENDER_EMAIL
+    msg['To'] = recipient
+    connection = _pool.get()
+    try:
+        connection.send(recipient, msg)
+    finally:
+        _pool.put(connection)
+
+def close_email_connection():
+    for connection in list(_pool.queue):
+        connection.close()
+
+def send_email_alert(status):
+    try:
+        deliver_email(f"⚠️ Alert! Drowsiness detected. Status: {status}")
         print("✅ Email alert sent successfully!")
         return True
 
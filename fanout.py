@@ -0,0 +1,97 @@
+# fanout.py
+"""
+Concurrent delivery of one message to many recipients.
+
+Each recipient's blocking SMTP/HTTP call runs on the caller's bounded
+executor with its own timeout, so one slow or failing endpoint never
+delays the others. The timeout starts when the send starts running, not
+while it waits for a free worker. A send that times out keeps running in
+its thread and may still arrive, so it is reported with ok=None (unknown)
+and must not be retried; so is a send whose error has `delivery_unknown`
+set (e.g. the connection dropped mid-transaction). A send that never got
+a worker within the timeout is cancelled and reported as failed.
+
+Recipient lists come from the admin Report Config settings, falling back
+to the ADMIN_EMAIL / CHAT_ID environment variables.
+"""
+import re
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from db import get_setting
+
+SEND_TIMEOUT = 30
+
+# ok: True delivered, False failed (safe to retry), None unknown (timed out in flight)
+Delivery = namedtuple("Delivery", ["recipient", "ok", "error", "seconds", "retry_after"])
+
+RECIPIENT_SETTINGS = {
+    "email": "report_email",
+    "telegram": "report_telegram",
+}
+
+
+def parse_recipients(value):
+    """Split a comma/semicolon/whitespace separated recipient list."""
+    return [r for r in re.split(r"[,;\s]+", value or "") if r]
+
+
+def configured_recipients(channel):
+    """Recipients for a channel from settings; [None] means the env default."""
+    key = RECIPIENT_SETTINGS.get(channel)
+    recipients = parse_recipients(get_setting(key)) if key else []
+    return recipients or [None]
+
+
+def _run_send(send, message, recipient, started, index):
+    started[index] = time.monotonic()
+    send(message, recipient)
+
+
+def _result(future, recipient, seconds):
+    error = future.exception()
+    if error is None:
+        return Delivery(recipient, True, None, seconds, None)
+    if getattr(error, "delivery_unknown", False):
+        return Delivery(recipient, None, f"{error}, delivery unknown", seconds, None)
+    return Delivery(recipient, False, str(error), seconds, getattr(error, "retry_after", None))
+
+
+def fan_out(send, message, recipients, executor, timeout=SEND_TIMEOUT):
+    """
+    Send `message` to all recipients concurrently on `executor`; returns one
+    Delivery per recipient, in order.
+    """
+    submitted = time.monotonic()
+    started = {}
+    futures = {
+        executor.submit(_run_send, send, message, recipient, started, i): i
+        for i, recipient in enumerate(recipients)
+    }
+    results = [None] * len(recipients)
+    pending = set(futures)
+
+    while pending:
+        # a send's clock starts when it runs; queued sends wait at most `timeout`
+        deadlines = {f: started.get(futures[f], submitted) + timeout for f in pending}
+        done, _ = wait(pending, timeout=max(min(deadlines.values()) - time.monotonic(), 0),
+                       return_when=FIRST_COMPLETED)
+        now = time.monotonic()
+        for future in done:
+            i = futures[future]
+            results[i] = _result(future, recipients[i], now - started.get(i, submitted))
+        pending -= done
+
+        for future in [f for f in pending if started.get(futures[f], submitted) + timeout <= now]:
+            i = futures[future]
+            if future.cancel():
+                results[i] = Delivery(recipients[i], False, f"not started within {timeout}s",
+                                      now - submitted, None)
+            else:
+                results[i] = Delivery(recipients[i], None,
+                                      f"timed out after {timeout}s, delivery unknown",
+                                      now - started.get(i, submitted), None)
+            pending.discard(future)
+
+    return results
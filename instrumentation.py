@@ -0,0 +1,151 @@
+# instrumentation.py
+"""
+Optional per-stage timing for the detection hot path.
+
+    with instrumentation.stage("detect"):
+        rects = detector(gray, 0)
+
+Timing is off by default and `stage()` then returns a shared no-op context.
+Once enabled, every stage keeps a rolling window of recent durations plus
+cumulative bucket counts, and `snapshot()` summarizes them. Set
+STAGE_TIMINGS_FILE to also write a snapshot to that file periodically.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+
+WINDOW = 500
+# upper bounds (ms) of the histogram buckets; the last bucket is open-ended
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+_enabled = False
+_lock = threading.Lock()
+_stages = {}
+_counters = {}
+_exporter = None
+_noop = nullcontext()
+
+
+class _StageStats:
+    def __init__(self):
+        self.recent = deque(maxlen=WINDOW)
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, ms):
+        self.recent.append(ms)
+        self.count += 1
+        self.total += ms
+        for i, bound in enumerate(BUCKETS_MS):
+            if ms <= bound:
+                self.buckets[i] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+
+    def summary(self):
+        recent = sorted(self.recent)
+
+        def pct(p):
+            return round(recent[min(len(recent) - 1, int(p / 100 * len(recent)))], 3) if recent else 0.0
+
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count, 3) if self.count else 0.0,
+            "p50_ms": pct(50),
+            "p95_ms": pct(95),
+            "p99_ms": pct(99),
+            "max_ms": round(recent[-1], 3) if recent else 0.0,
+            "buckets": dict(zip([f"<={b}ms" for b in BUCKETS_MS] + ["inf"], self.buckets)),
+        }
+
+
+class _Timer:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, (time.perf_counter() - self.start) * 1000)
+        return False
+
+
+def enable(on=True):
+    global _enabled
+    _enabled = on
+    path = os.getenv("STAGE_TIMINGS_FILE")
+    if on and path:
+        start_exporter(path)
+
+
+def is_enabled():
+    return _enabled
+
+
+def stage(name):
+    """Context manager timing one stage; a no-op unless timing is enabled."""
+    return _Timer(name) if _enabled else _noop
+
+
+def record(name, ms):
+    with _lock:
+        stats = _stages.get(name)
+        if stats is None:
+            stats = _stages[name] = _StageStats()
+        stats.add(ms)
+
+
+def incr(name, n=1):
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def reset():
+    with _lock:
+        _stages.clear()
+        _counters.clear()
+
+
+def snapshot():
+    with _lock:
+        return {
+            "time": time.time(),
+            "stages": {name: s.summary() for name, s in _stages.items()},
+            "counters": dict(_counters),
+        }
+
+
+def write_snapshot(path):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(snapshot(), f, indent=2)
+    os.replace(tmp, path)
+
+
+def start_exporter(path, interval=10.0):
+    """Write a snapshot to `path` every `interval` seconds (one exporter per process)."""
+    global _exporter
+    if _exporter is not None and _exporter.is_alive():
+        return
+
+    def loop():
+        while _enabled:
+            time.sleep(interval)
+            try:
+                write_snapshot(path)
+            except OSError as e:
+                print(f"⚠️ Could not write stage timings: {e}")
+
+    _exporter = threading.Thread(target=loop, daemon=True)
+    _exporter.start()
@@ -0,0 +1,150 @@
+# log_export.py
+"""
+Streaming export of log records.
+
+    python log_export.py --start 2025-01-01 --end 2025-12-31 --output logs.csv.gz
+    python log_export.py --start 2025-01-01 --end 2025-12-31 --output logs.parquet
+
+Rows are read from SQLite in fixed-size chunks and written out chunk by
+chunk, so memory use does not depend on the size of the date range.
+Parquet output needs the optional `pyarrow` package. With
+--include-archive, rows moved out by retention.py are exported as well.
+"""
+import argparse
+import csv
+import gzip
+import io
+from itertools import chain
+
+from db import get_db_connection, day_bounds, LOG_SELECT
+from retention import iter_archive_chunks
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+COLUMNS = ["id", "timestamp", "user_id", "ear", "status"]
+CHUNK_SIZE = 5000
+
+
+class ExportTooLarge(RuntimeError):
+    pass
+
+
+def iter_log_chunks(start_day, end_day, status="Drowsy", chunk_size=CHUNK_SIZE):
+    """Yield lists of log rows between two 'YYYY-MM-DD' days inclusive, oldest first."""
+    start_ts, end_ts = day_bounds(start_day, end_day)
+    with get_db_connection() as conn:
+        c = conn.cursor()
+        c.execute(f"""
+            SELECT {LOG_SELECT}
+            FROM logs
+            WHERE status = ? AND ts >= ? AND ts < ?
+            ORDER BY ts
+        """, (status, start_ts, end_ts))
+        while True:
+            rows = c.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+
+
+def iter_csv(chunks):
+    """Turn row chunks into UTF-8 CSV byte chunks, header first."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(COLUMNS)
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+def write_csv(path, chunks):
+    """Write chunks as CSV; gzip-compressed when `path` ends with .gz. Returns rows written."""
+    count = 0
+
+    def counted():
+        nonlocal count
+        for rows in chunks:
+            count += len(rows)
+            yield rows
+
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "wb") as f:
+        for data in iter_csv(counted()):
+            f.write(data)
+    return count
+
+
+def write_parquet(path, chunks, compression="zstd"):
+    """Write chunks as a Parquet file, one row group per chunk. Returns rows written."""
+    if pq is None:
+        raise RuntimeError("Parquet export requires pyarrow (pip install pyarrow)")
+
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("timestamp", pa.string()),
+        ("user_id", pa.int64()),
+        ("ear", pa.float64()),
+        ("status", pa.string()),
+    ])
+    count = 0
+    with pq.ParquetWriter(path, schema, compression=compression) as writer:
+        for rows in chunks:
+            columns = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+                schema=schema
+            ))
+            count += len(rows)
+    return count
+
+
+def _limited(chunks, max_rows):
+    count = 0
+    for rows in chunks:
+        count += len(rows)
+        if count > max_rows:
+            raise ExportTooLarge(f"More than {max_rows} log records in this range")
+        yield rows
+
+
+def export_logs(path, start_day, end_day, status="Drowsy", include_archive=False, max_rows=None):
+    """
+    Export to CSV, CSV.gz or Parquet depending on the file extension. Raises
+    ExportTooLarge (leaving a partial file) once more than `max_rows` rows
+    have been read.
+    """
+    chunks = iter_log_chunks(start_day, end_day, status)
+    if include_archive:
+        # archived rows are always older than the live ones
+        chunks = chain(iter_archive_chunks(start_day, end_day, status), chunks)
+    if max_rows is not None:
+        chunks = _limited(chunks, max_rows)
+    if path.endswith(".parquet"):
+        return write_parquet(path, chunks)
+    return write_csv(path, chunks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export log records.")
+    parser.add_argument("--start", required=True, help="first day, YYYY-MM-DD")
+    parser.add_argument("--end", required=True, help="last day, YYYY-MM-DD")
+    parser.add_argument("--status", default="Drowsy")
+    parser.add_argument("--output", required=True, help=".csv, .csv.gz or .parquet file")
+    parser.add_argument("--include-archive", action="store_true",
+                        help="also export rows moved to archive files")
+    args = parser.parse_args()
+
+    count = export_logs(args.output, args.start, args.end, args.status, args.include_archive)
+    print(f"✅ Exported {count} log record(s) to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
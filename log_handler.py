@@ -1,18 +1,153 @@
 # log_handler.py
 
-import sqlite3
-from datetime import datetime
-from db import DB_NAME, get_db_connection
+import atexit
+import threading
+import time
+from db import get_db_connection
 
-def log_event(ear, status, user_id):
+INSERT_SQL = "INSERT INTO logs (ts, ear, status, user_id, clip_id) VALUES (?, ?, ?, ?, ?)"
+
+
+class EventWriter:
+    """
+    Buffers log rows in memory and writes them from a background thread with
+    one executemany/commit per batch. A batch is flushed once `batch_size`
+    rows are waiting or `flush_interval` seconds have passed. When the
+    buffer holds `max_pending` rows new events are dropped and counted
+    instead of blocking the caller.
+    """
+
+    def __init__(self, batch_size=100, flush_interval=1.0, max_pending=5000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.pending = []
+        self.cond = threading.Condition()
+        self.closed = False
+        self.flushing = False
+
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.failed = 0
+        self.last_batch_ms = 0.0
+
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, row):
+        """Queue a row; returns False if it was dropped because the buffer is full."""
+        with self.cond:
+            if self.closed or len(self.pending) >= self.max_pending:
+                self.dropped += 1
+                if self.dropped == 1 or self.dropped % 100 == 0:
+                    print(f"⚠️ Log buffer full, {self.dropped} event(s) dropped")
+                return False
+            self.pending.append(row)
+            if len(self.pending) >= self.batch_size:
+                self.cond.notify_all()
+            return True
+
+    def _run(self):
+        while True:
+            with self.cond:
+                deadline = time.monotonic() + self.flush_interval
+                while not self.closed and len(self.pending) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.cond.wait(remaining)
+                batch, self.pending = self.pending, []
+                self.flushing = bool(batch)
+                if self.closed and not batch:
+                    self.cond.notify_all()
+                    return
+
+            if batch:
+                self._write(batch)
+            with self.cond:
+                self.flushing = False
+                self.cond.notify_all()
+
+    def _write(self, batch):
+        start = time.perf_counter()
+        try:
+            with get_db_connection() as conn:
+                conn.executemany(INSERT_SQL, batch)
+                conn.commit()
+            self.written += len(batch)
+            self.batches += 1
+        except Exception as e:
+            self.failed += len(batch)
+            print(f"⚠️ Failed to write {len(batch)} log event(s): {e}")
+        self.last_batch_ms = (time.perf_counter() - start) * 1000
+
+    def flush(self, timeout=5.0):
+        """Block until everything queued so far is written (or `timeout` passes)."""
+        deadline = time.monotonic() + timeout
+        with self.cond:
+            self.cond.notify_all()
+            while self.pending or self.flushing:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.cond.wait(remaining)
+        return True
+
+    def close(self, timeout=5.0):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        self.thread.join(timeout)
+
+    def stats(self):
+        with self.cond:
+            pending = len(self.pending)
+        return {
+            "pending": pending,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "batches": self.batches,
+            "last_batch_ms": self.last_batch_ms,
+        }
+
+
+class RateLimiter:
+    """Allows one event per `interval` seconds."""
+
+    def __init__(self, interval=10):
+        self.interval = interval
+        self.last = 0
+
+    def ready(self, now=None):
+        now = time.time() if now is None else now
+        if now - self.last > self.interval:
+            self.last = now
+            return True
+        return False
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = EventWriter()
+            atexit.register(_writer.close)
+        return _writer
+
+
+def flush_events(timeout=5.0):
+    return get_writer().flush(timeout)
+
+
+def log_event(ear, status, user_id, clip_id=None):
     # Only log if it's Drowsy
     if status != "Drowsy":
         return
 
-    with get_db_connection() as conn:
-        c = conn.cursor()
-        c.execute(
-            "INSERT INTO logs (timestamp, ear, status, user_id) VALUES (?, ?, ?, ?)",
-            (datetime.now(), ear, status, user_id)
-        )
-        conn.commit()
+    get_writer().submit((int(time.time()), ear, status, user_id, clip_id))
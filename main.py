@@ -1,20 +1,19 @@
 # main.py
 import streamlit as st
 import os
-import time
-import threading
+import socket
 from datetime import datetime
 
-from drowsiness import DrowsinessDetector
+# Heavy modules (cv2/dlib via drowsiness, pandas/plotly via admin_dashboard,
+# requests/smtplib via the notifiers) are imported where they are first
+# needed, so the login page starts without them.
+import instrumentation
 from db import (
     init_db, add_user, authenticate_user, ensure_default_admin,
-    fetch_user_stats
+    fetch_user_stats, get_setting
 )
-from log_handler import log_event
-from email_alert import send_email_alert
-from telegram_alert import send_telegram_alert
-from admin_scheduler import run_scheduler
-from admin_dashboard import render_admin_dashboard
+from log_handler import log_event, get_writer, RateLimiter
+from admin_scheduler import start_scheduler
 
 
 # ---------------- STREAMLIT CLOUD CHECK ----------------
@@ -27,15 +26,20 @@ def is_streamlit_cloud():
 
 
 # ---------------- INIT ----------------
-init_db()
-ensure_default_admin()
+# schema checks and the default admin run once per process, not per rerun
+@st.cache_resource
+def init_database():
+    init_db()
+    ensure_default_admin()
+    return True
+
+init_database()
 
 default_values = {
     "user_id": None,
     "is_admin": False,
     "dark_mode": False,
-    "sound_enabled": True,
-    "scheduler_started": False
+    "sound_enabled": True
 }
 for k, v in default_values.items():
     if k not in st.session_state:
@@ -83,14 +87,16 @@ def play_browser_alarm(enabled=True):
 
 
 # ---------------- ALERTS ----------------
-def trigger_alerts(status, sound_enabled=True):
-    play_browser_alarm(sound_enabled)
+def trigger_alerts(status, alert_key):
+    # first alert goes out now; repeats within the window are sent as one digest
     message = (
         f"🚨 Drowsiness detected at "
-        f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} | Status: {status}"
+        f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} | {alert_key} | Status: {status}"
     )
-    send_email_alert(message)
-    send_telegram_alert(message)
+    from alert_coalescer import get_coalescer
+
+    window = float(get_setting("alert_window_seconds", "300"))
+    get_coalescer(window).alert(alert_key, message)
 
 
 # ---------------- AUTH ----------------
@@ -148,64 +154,152 @@ else:
 
         # ⬇️ SAFE: import cv2 ONLY locally
         import cv2
+        from drowsiness import DrowsinessDetector
+        from pipeline import DetectionPipeline
+        from preview_stream import get_preview_server
+        from clip_recorder import ClipRecorder
 
         ear_thresh = st.sidebar.slider("EAR Threshold", 0.1, 0.4, 0.25)
         mar_thresh = st.sidebar.slider("MAR Threshold", 0.3, 0.7, 0.5)
         frame_check = st.sidebar.slider("Frame Check", 10, 40, 20)
+        log_interval = st.sidebar.slider("Log Interval (s)", 1, 60, 10)
+        track_faces = st.sidebar.checkbox("Track Face Between Detections", True)
+        detect_scale = st.sidebar.select_slider(
+            "Detection Scale", options=[0.25, 0.5, 0.75, 1.0], value=0.5
+        )
 
         start_btn = st.button("Start Detection")
         stop_btn = st.button("Stop Detection")
 
-        detector = DrowsinessDetector(
-            "models/shape_predictor_68_face_landmarks.dat",
-            ear_thresh, mar_thresh, frame_check
+        # one detector per session; reruns only update its settings and the
+        # landmark model itself is loaded once per process
+        detector = st.session_state.get("detector")
+        if detector is None:
+            detector = DrowsinessDetector(
+                "models/shape_predictor_68_face_landmarks.dat",
+                ear_thresh, mar_thresh, frame_check,
+                track=track_faces, detect_scale=detect_scale
+            )
+            st.session_state["detector"] = detector
+        else:
+            detector.update_settings(
+                ear_thresh, mar_thresh, frame_check,
+                track=track_faces, detect_scale=detect_scale
+            )
+
+        show_video = st.sidebar.checkbox("📺 Show Video", True)
+        display_fps = st.sidebar.slider("Display FPS", 5, 30, 15)
+        preview_width = st.sidebar.select_slider(
+            "Preview Width", options=[320, 480, 640, 960, 1280], value=640
         )
+        preview_quality = st.sidebar.slider("Preview Quality", 30, 95, 70)
+        save_clips = st.sidebar.checkbox("🎞️ Save Event Clips", True)
+        show_timings = st.sidebar.checkbox("⏱️ Stage Timings", instrumentation.is_enabled())
+        instrumentation.enable(show_timings)
 
-        frame_window = st.image([])
+        frame_window = st.empty()
         alert_placeholder = st.empty()
-
-        last_log_time = 0
-        alert_triggered = False
+        stats_placeholder = st.empty()
+        timings_placeholder = st.empty()
 
         if start_btn:
-            cap = cv2.VideoCapture(0)
-
-            while cap.isOpened():
-                ret, frame = cap.read()
-                if not ret:
-                    break
-
-                frame, status, ear, mar = detector.analyze_frame(frame)
-                frame_window.image(frame, channels="BGR")
-
-                now = time.time()
-                if status == "Drowsy":
-                    if now - last_log_time > 10:
-                        log_event(ear, status, st.session_state["user_id"])
-                        last_log_time = now
-
-                    if not alert_triggered:
-                        alert_placeholder.markdown(
-                            "<div class='blink'>🚨 Drowsiness Detected!</div>",
-                            unsafe_allow_html=True
-                        )
-                        threading.Thread(
-                            target=trigger_alerts,
-                            args=(status, st.session_state["sound_enabled"]),
-                            daemon=True
-                        ).start()
-                        alert_triggered = True
+            detector.reset()
+            user_id = st.session_state["user_id"]
+            alert_key = f"{stats['username']}@{socket.gethostname()}"
+            log_limiter = RateLimiter(log_interval)
+            alert_state = {"triggered": False}
+            recorder = ClipRecorder(user_id=user_id) if save_clips else None
+
+            # the browser pulls frames from this session's own MJPEG channel,
+            # so nothing per frame goes through the Streamlit websocket; if the
+            # stream port cannot be bound, frames go through st.image instead
+            preview = None
+            if show_video:
+                try:
+                    preview = get_preview_server().open_channel(
+                        width=preview_width, quality=preview_quality, fps=display_fps
+                    )
+                    frame_window.markdown(
+                        f'<img src="{preview.url}" style="max-width:100%" alt="Live preview">',
+                        unsafe_allow_html=True
+                    )
+                except OSError as e:
+                    st.warning(f"Preview stream unavailable ({e}); showing frames in the page.")
+
+            # runs on the analysis thread, so alerting never waits for the UI
+            def handle_result(result):
+                if result.status == "Drowsy":
+                    if log_limiter.ready():
+                        clip_id = recorder.trigger(result.captured_at) if recorder else None
+                        log_event(result.ear, result.status, user_id, clip_id)
+
+                    if not alert_state["triggered"]:
+                        trigger_alerts(result.status, alert_key)
+                        alert_state["triggered"] = True
                 else:
-                    alert_triggered = False
-                    alert_placeholder.empty()
-
-                if stop_btn:
-                    break
+                    alert_state["triggered"] = False
 
-            cap.release()
+            cap = cv2.VideoCapture(0)
+            pipeline = DetectionPipeline(
+                cap, detector, on_result=handle_result, display_fps=display_fps,
+                annotate=show_video and preview is None, preview=preview, recorder=recorder
+            )
+            pipeline.start()
+
+            alarm_shown = False
+            try:
+                while pipeline.running:
+                    result = pipeline.next_display_result()
+                    if result is None:
+                        continue
+
+                    if show_video and preview is None:
+                        with instrumentation.stage("ui_push"):
+                            frame_window.image(result.frame, channels="BGR")
+
+                    if result.status == "Drowsy":
+                        if not alarm_shown:
+                            alert_placeholder.markdown(
+                                "<div class='blink'>🚨 Drowsiness Detected!</div>",
+                                unsafe_allow_html=True
+                            )
+                            play_browser_alarm(st.session_state["sound_enabled"])
+                            alarm_shown = True
+                    elif alarm_shown:
+                        alert_placeholder.empty()
+                        alarm_shown = False
+
+                    stats = pipeline.stats()
+                    log_stats = get_writer().stats()
+                    stats_placeholder.caption(
+                        f"Latency: {stats['latency_ms']:.0f} ms | "
+                        f"Dropped (capture): {stats['dropped_capture']} | "
+                        f"Dropped (display): {stats['dropped_render']} | "
+                        f"Pending log writes: {log_stats['pending']} "
+                        f"(dropped {log_stats['dropped']})"
+                        + (f" | Preview: {preview.stats()['viewers']} viewer(s), "
+                           f"{preview.stats()['frame_kb']:.0f} KB/frame" if preview else "")
+                    )
+
+                    if show_timings and pipeline.rendered % 30 == 0:
+                        timings_placeholder.table([
+                            {"stage": name, **{k: v for k, v in summary.items() if k != "buckets"}}
+                            for name, summary in instrumentation.snapshot()["stages"].items()
+                        ])
+
+                    if stop_btn:
+                        break
+            finally:
+                # a Stop click reruns the script, which unwinds through here
+                pipeline.stop()
+                cap.release()
+                if preview is not None:
+                    preview.close()
 
     # ================= ADMIN =================
     elif page == "Admin Dashboard":
+        from admin_dashboard import render_admin_dashboard
+
         render_admin_dashboard(st.session_state["dark_mode"])
 
     if st.sidebar.button("Logout"):
@@ -214,6 +308,5 @@ else:
 
 
 # ---------------- SCHEDULER ----------------
-if not st.session_state["scheduler_started"]:
-    st.session_state["scheduler_started"] = True
-    threading.Thread(target=run_scheduler, daemon=True).start()
+# one scheduler per deployment, however many sessions/processes are running
+start_scheduler()
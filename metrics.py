@@ -0,0 +1,47 @@
+# metrics.py
+import numpy as np
+
+# start of each feature in the 68-point landmark layout
+# (same as imutils.face_utils.FACIAL_LANDMARKS_68_IDXS)
+RIGHT_EYE = 36
+LEFT_EYE = 42
+MOUTH = 48
+
+# point pairs for each ratio: two vertical distances (A, B) and one horizontal (C)
+_EYE_PAIRS = np.array([[1, 5], [2, 4], [0, 3]])
+_MOUTH_PAIRS = np.array([[2, 10], [4, 8], [0, 6]])
+
+# rows: left eye, right eye, mouth -> indexes into the full 68-point array
+_PAIRS = np.stack([_EYE_PAIRS + LEFT_EYE, _EYE_PAIRS + RIGHT_EYE, _MOUTH_PAIRS + MOUTH])
+
+
+def _aspect_ratio(points, pairs):
+    points = np.asarray(points, dtype=np.float64)
+    d = np.linalg.norm(points[..., pairs[..., 0], :] - points[..., pairs[..., 1], :], axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (d[..., 0] + d[..., 1]) / (2.0 * d[..., 2])
+
+
+def eye_aspect_ratio(eye):
+    """EAR of a (..., 6, 2) eye landmark array."""
+    return _aspect_ratio(eye, _EYE_PAIRS)
+
+
+def mouth_aspect_ratio(mouth):
+    """MAR of a (..., 20, 2) mouth landmark array."""
+    return _aspect_ratio(mouth, _MOUTH_PAIRS)
+
+
+def landmark_ratios(shapes):
+    """
+    Left EAR, right EAR and MAR for a (68, 2) landmark array or a stacked
+    (N, 68, 2) array of faces/frames, computed in one pass.
+    Returns an array of shape (..., 3).
+    """
+    return _aspect_ratio(shapes, _PAIRS)
+
+
+def ear_mar(shapes):
+    """Mean EAR of both eyes and MAR for one face (scalars) or N faces (arrays)."""
+    r = landmark_ratios(shapes)
+    return (r[..., 0] + r[..., 1]) / 2.0, r[..., 2]
@@ -0,0 +1,249 @@
+# notifier.py
+"""
+Long-lived notification dispatcher.
+
+    get_dispatcher().notify("🚨 Drowsiness detected ...")
+
+Messages go to every configured recipient of a channel at once (see
+fanout.py); only recipients that failed are retried, and each attempt is
+recorded in the notification_deliveries table. A send that timed out while
+in flight may still arrive, so it is recorded as unknown and not retried.
+
+Each channel (email, Telegram) has one worker thread with a bounded queue,
+so callers never block on network I/O, and a fixed pool of send threads,
+so a burst of alerts cannot spawn more threads. Sends are paced by a
+per-channel token bucket, one token per recipient, to stay under provider
+limits (which count recipients, not messages). Failed deliveries are retried with exponential backoff
+(or the provider's retry-after hint); when a channel's queue is full new
+messages are dropped and counted.
+"""
+import atexit
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from db import record_deliveries
+from fanout import fan_out, configured_recipients
+
+MAX_QUEUE = 100
+RETRIES = 3
+BACKOFF_SECONDS = 2.0
+
+# concurrent sends per channel; email matches email_alert.SMTP_POOL_SIZE so
+# a send never waits for a pooled connection after it has started
+CONCURRENCY = {
+    "email": 4,
+    "telegram": 8,
+}
+DEFAULT_CONCURRENCY = 4
+
+# (burst size, tokens refilled per second) per channel; one token per recipient
+RATE_LIMITS = {
+    "email": (5, 1 / 60),
+    "telegram": (10, 1 / 3),
+}
+
+
+class TokenBucket:
+    def __init__(self, capacity, rate):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def wait_time(self, count=1):
+        """Seconds until `count` tokens are available (0 if they are available now)."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return 0.0 if self.tokens >= count else (count - self.tokens) / self.rate
+
+    def take(self, count=1):
+        self.tokens -= count
+
+
+class ChannelWorker:
+    """
+    Delivers a channel's messages; `send(message, recipient)` raises on failure
+    and `recipients()` returns the current recipient list.
+    """
+
+    def __init__(self, name, send, recipients=None, max_queue=MAX_QUEUE, retries=RETRIES,
+                 backoff=BACKOFF_SECONDS, rate_limit=None, concurrency=DEFAULT_CONCURRENCY):
+        self.name = name
+        self.send = send
+        self.recipients = recipients or (lambda: [None])
+        self.bucket = TokenBucket(*rate_limit) if rate_limit else None
+        self.retries = retries
+        self.backoff = backoff
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.stop_event = threading.Event()
+        self.executor = ThreadPoolExecutor(concurrency, thread_name_prefix=f"send-{name}")
+
+        self.sent = 0
+        self.failed = 0
+        self.unknown = 0
+        self.retried = 0
+        self.dropped = 0
+        self.throttled = 0
+        self.last_latency = 0.0
+        self.last_error = None
+
+        self.thread = threading.Thread(target=self._run, name=f"notify-{name}", daemon=True)
+        self.thread.start()
+
+    def submit(self, message):
+        try:
+            self.queue.put_nowait((message, time.time()))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            print(f"⚠️ {self.name} queue full, notification dropped")
+            return False
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            try:
+                message, queued_at = self.queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            self._deliver(message, queued_at)
+            self.queue.task_done()
+
+    def _deliver(self, message, queued_at):
+        pending = self.recipients()
+        for attempt in range(self.retries + 1):
+            results = self._fan_out(message, pending)
+            self._record(results, attempt + 1)
+            failed = [r for r in results if r.ok is False]
+            unknown = [r for r in results if r.ok is None]
+            self.sent += len(results) - len(failed) - len(unknown)
+            self.unknown += len(unknown)
+            if unknown:
+                self.last_error = unknown[0].error
+            if not failed:
+                self.last_latency = time.time() - queued_at
+                print(f"✅ {self.name} notification delivered")
+                return
+
+            self.last_error = failed[0].error
+            pending = [r.recipient for r in failed]
+            if attempt == self.retries or self.stop_event.is_set():
+                break
+            self.retried += len(failed)
+            retry_after = max((r.retry_after or 0) for r in failed)
+            self.stop_event.wait(retry_after or self.backoff * (2 ** attempt))
+
+        self.failed += len(pending)
+        print(f"⚠️ {self.name} notification failed for {len(pending)} recipient(s): {self.last_error}")
+
+    def _fan_out(self, message, recipients):
+        """
+        fan_out() paced by the token bucket: every recipient costs a token, and
+        lists longer than the bucket go out in bucket-sized batches.
+        """
+        if self.bucket is None:
+            return fan_out(self.send, message, recipients, self.executor)
+
+        results = []
+        size = max(int(self.bucket.capacity), 1)
+        for i in range(0, len(recipients), size):
+            batch = recipients[i:i + size]
+            wait = self.bucket.wait_time(len(batch))
+            if wait > 0:
+                self.throttled += 1
+                self.stop_event.wait(wait)
+            self.bucket.take(len(batch))
+            results.extend(fan_out(self.send, message, batch, self.executor))
+        return results
+
+    def _record(self, results, attempt):
+        try:
+            record_deliveries([
+                (self.name, r.recipient or "default", None if r.ok is None else int(r.ok),
+                 attempt, r.error, round(r.seconds * 1000, 1))
+                for r in results
+            ])
+        except Exception as e:
+            print(f"⚠️ Could not record {self.name} deliveries: {e}")
+
+    def stats(self):
+        return {
+            "queued": self.queue.qsize(),
+            "sent": self.sent,
+            "failed": self.failed,
+            "unknown": self.unknown,
+            "retried": self.retried,
+            "dropped": self.dropped,
+            "throttled": self.throttled,
+            "last_latency_s": round(self.last_latency, 3),
+            "last_error": self.last_error,
+        }
+
+
+# smtplib and requests are only imported once the first message is sent
+def _send_email(message, recipient):
+    from email_alert import deliver_email
+    deliver_email(message, recipient=recipient)
+
+
+def _send_telegram(message, recipient):
+    from telegram_alert import deliver_telegram
+    deliver_telegram(message, recipient)
+
+
+class NotificationDispatcher:
+    def __init__(self, channels=None):
+        channels = channels or {
+            "email": _send_email,
+            "telegram": _send_telegram,
+        }
+        self.workers = {
+            name: ChannelWorker(
+                name, send,
+                recipients=lambda name=name: configured_recipients(name),
+                rate_limit=RATE_LIMITS.get(name),
+                concurrency=CONCURRENCY.get(name, DEFAULT_CONCURRENCY)
+            )
+            for name, send in channels.items()
+        }
+
+    def notify(self, message, channels=None):
+        """Queue a message on the given channels (default: all); returns the channels accepted."""
+        names = channels or list(self.workers)
+        return [name for name in names if self.workers[name].submit(message)]
+
+    def flush(self, timeout=30.0):
+        deadline = time.time() + timeout
+        for worker in self.workers.values():
+            while worker.queue.unfinished_tasks and time.time() < deadline:
+                time.sleep(0.05)
+
+    def stop(self, timeout=5.0):
+        self.flush(timeout)
+        for worker in self.workers.values():
+            worker.stop_event.set()
+        for worker in self.workers.values():
+            worker.thread.join(timeout)
+            worker.executor.shutdown(wait=False)
+        if "email_alert" in sys.modules:
+            sys.modules["email_alert"].close_email_connection()
+
+    def stats(self):
+        return {name: worker.stats() for name, worker in self.workers.items()}
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher():
+    """The process-wide dispatcher, started on first use."""
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = NotificationDispatcher()
+            atexit.register(_dispatcher.stop)
+        return _dispatcher
@@ -0,0 +1,171 @@
+# pipeline.py
+import threading
+import time
+from collections import namedtuple
+
+import instrumentation
+
+FrameResult = namedtuple(
+    "FrameResult",
+    ["frame", "status", "ear", "mar", "captured_at", "analyzed_at", "analysis"]
+)
+
+
+class LatestQueue:
+    """Bounded queue where a put on a full queue evicts the oldest item."""
+
+    def __init__(self, maxsize=1, name="queue"):
+        self.name = name
+        self.maxsize = maxsize
+        self.items = []
+        self.dropped = 0
+        self.cond = threading.Condition()
+
+    def put(self, item):
+        with self.cond:
+            if len(self.items) >= self.maxsize:
+                self.items.pop(0)
+                self.dropped += 1
+                instrumentation.incr(f"{self.name}_dropped")
+            self.items.append(item)
+            self.cond.notify()
+
+    def get(self, timeout=None):
+        """Return the oldest item, or None if nothing arrived within `timeout`."""
+        with self.cond:
+            if not self.items:
+                self.cond.wait(timeout)
+            return self.items.pop(0) if self.items else None
+
+    def wake(self):
+        with self.cond:
+            self.cond.notify_all()
+
+
+class DetectionPipeline:
+    """
+    Capture -> analysis -> render stages for live detection.
+
+    The capture thread reads the camera into a latest-frame-wins queue, the
+    analysis thread runs the detector on the newest frame and calls
+    `on_result` (alert/logging work) straight away, and the caller renders
+    with `next_display_result`, which is capped at `display_fps`. A slow UI
+    push therefore never delays capture or alerting, it only skips frames.
+    Frames are analyzed without drawing; the overlay is only drawn on frames
+    handed out for display, and not at all when `annotate` is False.
+
+    With a `preview` (see preview_stream.py) every analyzed frame is also
+    offered to it; the preview scales, draws and encodes on its own thread.
+    A `recorder` (see clip_recorder.py) is fed each frame before `on_result`
+    runs, so a clip triggered from the handler includes the event frame.
+    """
+
+    def __init__(self, cap, detector, on_result=None, display_fps=15, queue_size=1,
+                 annotate=True, preview=None, recorder=None):
+        self.cap = cap
+        self.detector = detector
+        self.annotate = annotate
+        self.preview = preview
+        self.recorder = recorder
+        self.on_result = on_result
+        self.display_interval = 1.0 / display_fps if display_fps else 0
+        self.frames = LatestQueue(queue_size, name="capture")
+        self.results = LatestQueue(1, name="render")
+        self.stop_event = threading.Event()
+        self.threads = []
+        self.last_render = 0
+
+        self.captured = 0
+        self.analyzed = 0
+        self.rendered = 0
+        self.latency = 0.0  # capture-to-analysis latency of the latest frame (s)
+
+    @property
+    def running(self):
+        return not self.stop_event.is_set()
+
+    @property
+    def dropped_capture(self):
+        """Frames captured but replaced before the analysis stage got to them."""
+        return self.frames.dropped
+
+    @property
+    def dropped_render(self):
+        """Analyzed frames that were never displayed."""
+        return self.results.dropped
+
+    def start(self):
+        for target in (self._capture_loop, self._analysis_loop):
+            t = threading.Thread(target=target, daemon=True)
+            t.start()
+            self.threads.append(t)
+
+    def stop(self, timeout=2.0):
+        self.stop_event.set()
+        self.frames.wake()
+        self.results.wake()
+        for t in self.threads:
+            t.join(timeout)
+        self.threads = []
+        if self.recorder is not None:
+            self.recorder.flush()
+
+    def _capture_loop(self):
+        while self.running and self.cap.isOpened():
+            with instrumentation.stage("capture_read"):
+                ret, frame = self.cap.read()
+            if not ret:
+                break
+            self.captured += 1
+            instrumentation.incr("frames_captured")
+            self.frames.put((frame, time.time()))
+        self.stop_event.set()
+        self.results.wake()
+
+    def _analysis_loop(self):
+        while self.running:
+            item = self.frames.get(timeout=0.5)
+            if item is None:
+                continue
+            frame, captured_at = item
+            with instrumentation.stage("analyze_total"):
+                analysis = self.detector.analyze(frame)
+            result = FrameResult(frame, analysis.status, analysis.ear, analysis.mar,
+                                 captured_at, time.time(), analysis)
+            self.analyzed += 1
+            self.latency = result.analyzed_at - captured_at
+
+            if self.recorder is not None:
+                self.recorder.add(frame, captured_at)
+            if self.on_result is not None:
+                try:
+                    self.on_result(result)
+                except Exception as e:
+                    print(f"⚠️ Result handler failed: {e}")
+
+            if self.preview is not None:
+                self.preview.submit(frame, analysis, self.detector.annotate)
+            self.results.put(result)
+
+    def next_display_result(self, timeout=1.0):
+        """Block until the next display slot and return the newest analyzed frame."""
+        wait = self.last_render + self.display_interval - time.time()
+        if wait > 0:
+            self.stop_event.wait(wait)
+        result = self.results.get(timeout=timeout)
+        if result is not None:
+            if self.annotate:
+                self.detector.annotate(result.frame, result.analysis)
+            self.last_render = time.time()
+            self.rendered += 1
+        return result
+
+    def stats(self):
+        return {
+            "captured": self.captured,
+            "analyzed": self.analyzed,
+            "rendered": self.rendered,
+            "dropped_capture": self.dropped_capture,
+            "dropped_render": self.dropped_render,
+            "latency_ms": self.latency * 1000,
+        }
@@ -0,0 +1,282 @@
+# preview_stream.py
+"""
+MJPEG preview stream for live detection.
+
+    channel = get_preview_server().open_channel(width=640, quality=70, fps=10)
+    pipeline = DetectionPipeline(cap, detector, preview=channel)
+    # browser: <img src="{channel.url}">
+    channel.close()
+
+One HTTP server per process serves a separate channel per detection
+session. Each channel has its own settings and frames and is addressed by
+a random token in its URL (/stream/<token>), so only the page that opened
+it can find it. Unknown tokens get a 404.
+
+The analysis thread only hands its newest frame over (latest wins). The
+channel's encoder thread downscales it to the preview width, draws the
+overlay on the small frame, JPEG-encodes it at most `fps` times a second,
+and only while someone is watching. Every viewer of a channel is sent the
+same encoded frame, so CPU cost does not grow with the number of viewers
+and a slow viewer only skips frames. Frames no longer go through the
+Streamlit websocket.
+
+Configured with PREVIEW_STREAM_HOST / PREVIEW_STREAM_PORT (bind address,
+default 127.0.0.1:8765; set the host to 0.0.0.0 for remote viewers) and
+PREVIEW_STREAM_URL (base address browsers use, default
+http://localhost:<port>).
+"""
+import atexit
+import os
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+
+import instrumentation
+from pipeline import LatestQueue
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+BOUNDARY = "frame"
+
+PAGE = """<!doctype html>
+<html><body style="margin:0;background:#000">
+<img src="/stream/{token}" style="width:100%;height:auto">
+</body></html>"""
+
+
+class PreviewChannel:
+    """One session's preview: its settings, newest frame and encoder thread."""
+
+    def __init__(self, token, url, width=640, quality=70, fps=10, on_close=None):
+        self.token = token
+        self.url = url
+        self.on_close = on_close
+        self.width = width
+        self.quality = quality
+        self.fps = fps
+
+        self.frames = LatestQueue(1, name="preview")
+        self.cond = threading.Condition()
+        self.jpeg = None
+        self.seq = 0
+        self.viewers = 0
+        self.closed = threading.Event()
+
+        self.encoded = 0
+        self.bytes_sent = 0
+        self.thread = threading.Thread(target=self._encode_loop, name="preview-encode",
+                                       daemon=True)
+        self.thread.start()
+
+    def configure(self, width=None, quality=None, fps=None):
+        """Change preview settings; applied from the next encoded frame."""
+        if width:
+            self.width = int(width)
+        if quality:
+            self.quality = int(quality)
+        if fps:
+            self.fps = float(fps)
+
+    # ---- producer side -------------------------------------------------
+
+    def submit(self, frame, analysis=None, draw=None):
+        """
+        Offer a frame for the preview (called from the analysis thread; never
+        blocks). `draw(frame, analysis)` overlays the analysis on the scaled copy.
+        """
+        if self.viewers:
+            self.frames.put((frame, analysis, draw))
+
+    def _scale(self, frame, analysis):
+        h, w = frame.shape[:2]
+        if not self.width or w <= self.width:
+            return frame.copy(), analysis
+        scale = self.width / w
+        small = cv2.resize(frame, (self.width, int(h * scale)), interpolation=cv2.INTER_AREA)
+        if analysis is not None and analysis.faces:
+            analysis = analysis._replace(faces=[
+                ((shape * scale).astype(shape.dtype), flagged) for shape, flagged in analysis.faces
+            ])
+        return small, analysis
+
+    def _encode_loop(self):
+        last = 0.0
+        while not self.closed.is_set():
+            wait = last + 1.0 / max(self.fps, 0.1) - time.time()
+            if wait > 0:
+                self.closed.wait(wait)
+            item = self.frames.get(timeout=0.5)
+            if item is None:
+                continue
+            frame, analysis, draw = item
+            with instrumentation.stage("preview_encode"):
+                small, analysis = self._scale(frame, analysis)
+                if draw is not None and analysis is not None:
+                    draw(small, analysis)
+                ok, buf = cv2.imencode(".jpg", small, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+            last = time.time()
+            if not ok:
+                continue
+            with self.cond:
+                self.jpeg = buf.tobytes()
+                self.seq += 1
+                self.encoded += 1
+                self.cond.notify_all()
+
+    # ---- viewer side ---------------------------------------------------
+
+    def next_jpeg(self, seq, timeout=1.0):
+        """Wait for a frame newer than `seq`; returns (seq, jpeg) or (seq, None)."""
+        with self.cond:
+            if self.seq == seq:
+                self.cond.wait(timeout)
+            if self.seq == seq or self.jpeg is None:
+                return seq, None
+            return self.seq, self.jpeg
+
+    def _viewer(self, delta):
+        with self.cond:
+            self.viewers += delta
+
+    def close(self, timeout=2.0):
+        if self.on_close is not None:
+            self.on_close(self.token)
+        self.closed.set()
+        self.frames.wake()
+        with self.cond:
+            self.cond.notify_all()
+        self.thread.join(timeout)
+
+    def stats(self):
+        return {
+            "viewers": self.viewers,
+            "encoded": self.encoded,
+            "dropped": self.frames.dropped,
+            "bytes_sent": self.bytes_sent,
+            "frame_kb": round(len(self.jpeg) / 1024, 1) if self.jpeg else 0.0,
+        }
+
+
+class PreviewServer:
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, base_url=None):
+        self.base_url = (base_url or f"http://localhost:{port}").rstrip("/")
+        self.channels = {}
+        self.lock = threading.Lock()
+        # binds here, so a port in use raises OSError before anything starts
+        self.server = ThreadingHTTPServer((host, port), _handler_for(self))
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name="preview-http",
+                                       daemon=True)
+        self.thread.start()
+
+    def open_channel(self, **settings):
+        """Start a channel for one session; close() it when the session stops."""
+        token = secrets.token_urlsafe(16)
+        channel = PreviewChannel(token, f"{self.base_url}/stream/{token}",
+                                 on_close=self._forget, **settings)
+        with self.lock:
+            self.channels[token] = channel
+        return channel
+
+    def _forget(self, token):
+        with self.lock:
+            self.channels.pop(token, None)
+
+    def channel(self, token):
+        with self.lock:
+            return self.channels.get(token)
+
+    def stop(self):
+        with self.lock:
+            channels = list(self.channels.values())
+        for channel in channels:
+            channel.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _handler_for(preview_server):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            kind, _, token = self.path.strip("/").partition("/")
+            channel = preview_server.channel(token.removesuffix(".jpg")) if token else None
+            if channel is None:
+                self._send(404, "text/plain", b"not found")
+            elif kind == "stream":
+                self._stream(channel)
+            elif kind == "snapshot":
+                self._snapshot(channel)
+            elif kind == "view":
+                self._send(200, "text/html", PAGE.format(token=channel.token).encode())
+            else:
+                self._send(404, "text/plain", b"not found")
+
+        def _send(self, code, content_type, body):
+            self.send_response(code)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Cache-Control", "no-store")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _snapshot(self, channel):
+            jpeg = channel.jpeg
+            if jpeg is None:
+                self._send(503, "text/plain", b"no frame yet")
+            else:
+                self._send(200, "image/jpeg", jpeg)
+
+        def _stream(self, channel):
+            self.send_response(200)
+            self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={BOUNDARY}")
+            self.send_header("Cache-Control", "no-store")
+            self.end_headers()
+            channel._viewer(1)
+            seq = 0
+            try:
+                while not channel.closed.is_set():
+                    seq, jpeg = channel.next_jpeg(seq)
+                    if jpeg is None:
+                        continue
+                    self.wfile.write(
+                        f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                        f"Content-Length: {len(jpeg)}\r\n\r\n".encode()
+                    )
+                    self.wfile.write(jpeg)
+                    self.wfile.write(b"\r\n")
+                    channel.bytes_sent += len(jpeg)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # viewer went away
+            finally:
+                channel._viewer(-1)
+
+        def log_message(self, format, *args):
+            pass  # one line per request would flood the console
+
+    return Handler
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def get_preview_server():
+    """
+    The process-wide preview server, started on first use. Raises OSError
+    if the port cannot be bound (e.g. another process already serves it);
+    the next call tries again.
+    """
+    global _server
+    with _server_lock:
+        if _server is None:
+            server = PreviewServer(
+                host=os.getenv("PREVIEW_STREAM_HOST", DEFAULT_HOST),
+                port=int(os.getenv("PREVIEW_STREAM_PORT", DEFAULT_PORT)),
+                base_url=os.getenv("PREVIEW_STREAM_URL"),
+            )
+            atexit.register(server.stop)
+            _server = server
+        return _server
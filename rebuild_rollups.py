@@ -0,0 +1,6 @@
+from db import init_db, rebuild_rollups
+
+# Recompute the user_stats / daily_stats rollup tables from the raw logs
+init_db()
+rebuild_rollups()
+print("✅ Rollup tables rebuilt from logs.")
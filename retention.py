@@ -0,0 +1,218 @@
+# retention.py
+"""
+Retention and archival of log records.
+
+    python retention.py              # apply the configured policies
+    python retention.py --dry-run    # only report what would be moved
+
+Each policy selects rows by status (or all rows) that are older than a
+number of days and either deletes them or moves them into gzip-compressed
+monthly archive files (`archive/logs-YYYY-MM.csv.gz`). Rows are handled in
+small id-ordered batches, each in its own short transaction followed by an
+incremental vacuum, so a running detector is never blocked for long. The
+batch size adapts so no batch holds the write lock longer than
+MAX_LOCK_SECONDS.
+
+Policies are read from the `retention_policies` setting (JSON list) and
+default to DEFAULT_POLICIES. The per-user/per-day stats follow the live
+database, so archived rows no longer count towards them.
+"""
+import argparse
+import csv
+import gzip
+import io
+import json
+import os
+import time
+from datetime import datetime
+
+from db import init_db, get_db_connection, get_setting, day_bounds, refresh_last_ts
+
+DEFAULT_POLICIES = [
+    # replaces clear_normal_logs.py
+    {"status": "Normal", "older_than_days": 0, "action": "delete"},
+    {"status": None, "older_than_days": 90, "action": "archive"},
+]
+ARCHIVE_DIR = "archive"
+ARCHIVE_COLUMNS = ["id", "ts", "timestamp", "user_id", "ear", "status"]
+# longest a batch may hold the write lock, well under busy_timeout
+MAX_LOCK_SECONDS = 0.1
+MIN_BATCH = 50
+
+
+def load_policies():
+    raw = get_setting("retention_policies")
+    return json.loads(raw) if raw else DEFAULT_POLICIES
+
+
+def archive_dir():
+    return get_setting("archive_dir", ARCHIVE_DIR)
+
+
+def partition_path(directory, ts):
+    return os.path.join(directory, f"logs-{datetime.fromtimestamp(ts):%Y-%m}.csv.gz")
+
+
+def _append_to_archive(directory, rows):
+    """Append rows to their monthly partitions (each append is a new gzip member)."""
+    by_partition = {}
+    for row in rows:
+        by_partition.setdefault(partition_path(directory, row[1]), []).append(row)
+
+    for path, part_rows in by_partition.items():
+        new = not os.path.exists(path)
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        if new:
+            writer.writerow(ARCHIVE_COLUMNS)
+        writer.writerows(part_rows)
+        with gzip.open(path, "ab") as f:
+            f.write(buf.getvalue().encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def apply_policy(policy, batch_size=1000, pause=0.05, dry_run=False, directory=None,
+                 max_lock_seconds=MAX_LOCK_SECONDS):
+    """
+    Apply one policy; returns the number of rows deleted or archived.
+
+    `batch_size` is an upper bound: a batch whose delete held the write lock
+    longer than `max_lock_seconds` halves the size of the next one, and
+    quick batches grow it back.
+    """
+    directory = directory or archive_dir()
+    cutoff = int(time.time()) - int(policy["older_than_days"] * 86400)
+    action = policy.get("action", "archive")
+    status = policy.get("status")
+
+    # every row has ts since the schema 3 backfill; a status policy walks the
+    # (status, ts) index, the all-rows policy the id order. Deleted rows drop
+    # out of the next query, so each batch starts at the front again.
+    if status is None:
+        where, order, params = "ts < ?", "id", [cutoff]
+    else:
+        where, order, params = "status = ? AND ts < ?", "ts", [status, cutoff]
+
+    if dry_run:
+        with get_db_connection() as conn:
+            c = conn.cursor()
+            c.execute(f"SELECT COUNT(*) FROM logs WHERE {where}", params)
+            return c.fetchone()[0]
+
+    if action == "archive":
+        os.makedirs(directory, exist_ok=True)
+
+    moved = 0
+    size = batch_size
+    while True:
+        with get_db_connection() as conn:
+            c = conn.cursor()
+            c.execute(f"""
+                SELECT id, ts, datetime(ts, 'unixepoch', 'localtime'),
+                       user_id, ear, status
+                FROM logs
+                WHERE {where}
+                ORDER BY {order}
+                LIMIT ?
+            """, params + [size])
+            rows = c.fetchall()
+            if not rows:
+                break
+
+            # archive first: a crash before the delete leaves duplicates, never gaps
+            if action == "archive":
+                _append_to_archive(directory, rows)
+
+            # the write lock is held from the delete to the commit
+            ids = [row[0] for row in rows]
+            locked_at = time.perf_counter()
+            c.execute(f"DELETE FROM logs WHERE id IN ({','.join('?' * len(ids))})", ids)
+            refresh_last_ts(c, [(row[3], row[1]) for row in rows])
+            conn.commit()
+            held = time.perf_counter() - locked_at
+            c.execute("PRAGMA incremental_vacuum(500)")
+            c.fetchall()
+
+        if held > max_lock_seconds:
+            size = max(size // 2, MIN_BATCH)
+        elif held < max_lock_seconds / 2:
+            size = min(size * 2, batch_size)
+        moved += len(rows)
+        time.sleep(pause)
+
+    return moved
+
+
+def run_retention(policies=None, batch_size=1000, pause=0.05, dry_run=False):
+    results = []
+    for policy in policies or load_policies():
+        count = apply_policy(policy, batch_size, pause, dry_run)
+        results.append((policy, count))
+    return results
+
+
+def iter_archive_chunks(start_day, end_day, status="Drowsy", directory=None, chunk_size=5000):
+    """
+    Yield lists of archived rows (id, timestamp, user_id, ear, status) between
+    two 'YYYY-MM-DD' days inclusive, reading only the overlapping partitions.
+    """
+    directory = directory or archive_dir()
+    start_ts, end_ts = day_bounds(start_day, end_day)
+    first = f"logs-{datetime.fromtimestamp(start_ts):%Y-%m}.csv.gz"
+    last = f"logs-{datetime.fromtimestamp(end_ts - 1):%Y-%m}.csv.gz"
+    if not os.path.isdir(directory):
+        return
+
+    for name in sorted(os.listdir(directory)):
+        if not (name.startswith("logs-") and first <= name <= last):
+            continue
+        with gzip.open(os.path.join(directory, name), "rt", newline="") as f:
+            chunk = []
+            for row in csv.DictReader(f):
+                if row["id"] == "id":  # header repeated by a re-created partition
+                    continue
+                ts = int(row["ts"])
+                if start_ts <= ts < end_ts and (status is None or row["status"] == status):
+                    chunk.append((int(row["id"]), row["timestamp"],
+                                  int(row["user_id"]) if row["user_id"] else None,
+                                  float(row["ear"]) if row["ear"] else None,
+                                  row["status"]))
+                    if len(chunk) >= chunk_size:
+                        yield chunk
+                        chunk = []
+            if chunk:
+                yield chunk
+
+
+def enable_incremental_vacuum():
+    """Switch an existing database to incremental auto-vacuum (runs a full VACUUM once)."""
+    with get_db_connection() as conn:
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("VACUUM")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply log retention policies.")
+    parser.add_argument("--dry-run", action="store_true", help="count matching rows only")
+    parser.add_argument("--batch-size", type=int, default=1000, help="maximum rows per transaction")
+    parser.add_argument("--pause", type=float, default=0.05, help="seconds to sleep between batches")
+    parser.add_argument("--enable-incremental-vacuum", action="store_true",
+                        help="one-time VACUUM so older databases can shrink incrementally")
+    args = parser.parse_args()
+
+    init_db()
+    if args.enable_incremental_vacuum:
+        enable_incremental_vacuum()
+        print("✅ Incremental vacuum enabled.")
+
+    for policy, count in run_retention(None, args.batch_size, args.pause, args.dry_run):
+        target = policy.get("status") or "all"
+        verb = "would be" if args.dry_run else ("archived" if policy.get("action", "archive") == "archive" else "deleted")
+        if args.dry_run:
+            verb += " " + policy.get("action", "archive") + "d"
+        print(f"{count} '{target}' log(s) older than {policy['older_than_days']} day(s) {verb}.")
+
+
+if __name__ == "__main__":
+    main()
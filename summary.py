@@ -0,0 +1,115 @@
+# summary.py
+"""
+Incremental summary reports.
+
+Each daily run only aggregates log rows added since the previous run: the
+id of the last row already reported is kept as a watermark, and the new
+rows are read as an id range (a primary-key range scan, no full-table
+COUNT). Every run's totals and per-user counts are stored in
+summary_periods / summary_user_counts, so weekly and monthly reports are
+built from the stored daily results without touching the logs table.
+init_db() seeds the watermark with the newest log id while no summary has
+been stored yet, so the first run only reports rows added since then.
+"""
+import time
+from datetime import date, timedelta
+
+from db import get_db_connection
+
+
+def get_watermark():
+    """Id of the last log row included in a stored summary (0 if none)."""
+    with get_db_connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT COALESCE(MAX(last_id), 0) FROM summary_periods")
+        return c.fetchone()[0]
+
+
+def summarize_new_logs(day=None):
+    """
+    Aggregate logs added since the watermark into the period `day`
+    ('YYYY-MM-DD', default today) and store it. Returns the period dict.
+    """
+    day = day or date.today().isoformat()
+    watermark = get_watermark()
+
+    with get_db_connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT COALESCE(MAX(id), 0) FROM logs")
+        last_id = max(c.fetchone()[0], watermark)
+
+        c.execute("""
+            SELECT COALESCE(user_id, 0), COUNT(*), SUM(status = 'Drowsy')
+            FROM logs
+            WHERE id > ? AND id <= ?
+            GROUP BY COALESCE(user_id, 0)
+        """, (watermark, last_id))
+        per_user = c.fetchall()
+
+        total = sum(row[1] for row in per_user)
+        drowsy = sum(row[2] for row in per_user)
+
+        # re-running a day merges into its existing period
+        c.execute("""
+            INSERT INTO summary_periods (day, first_id, last_id, total_logs, drowsy_logs, created_ts)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (day) DO UPDATE SET
+                last_id = excluded.last_id,
+                total_logs = total_logs + excluded.total_logs,
+                drowsy_logs = drowsy_logs + excluded.drowsy_logs,
+                created_ts = excluded.created_ts
+        """, (day, watermark + 1, last_id, total, drowsy, int(time.time())))
+        c.executemany("""
+            INSERT INTO summary_user_counts (day, user_id, total_logs, drowsy_logs)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (day, user_id) DO UPDATE SET
+                total_logs = total_logs + excluded.total_logs,
+                drowsy_logs = drowsy_logs + excluded.drowsy_logs
+        """, [(day,) + tuple(row) for row in per_user])
+        conn.commit()
+
+    return build_period_report(day, day)
+
+
+def build_period_report(start_day, end_day, top=3):
+    """Totals and top users over stored daily periods between two days inclusive."""
+    with get_db_connection() as conn:
+        c = conn.cursor()
+        c.execute("""
+            SELECT COALESCE(SUM(total_logs), 0), COALESCE(SUM(drowsy_logs), 0), COUNT(*)
+            FROM summary_periods
+            WHERE day >= ? AND day <= ?
+        """, (start_day, end_day))
+        total, drowsy, periods = c.fetchone()
+
+        c.execute("""
+            SELECT COALESCE(u.username, 'Unknown'), SUM(s.total_logs) AS logs
+            FROM summary_user_counts s
+            LEFT JOIN users u ON u.id = s.user_id
+            WHERE s.day >= ? AND s.day <= ?
+            GROUP BY s.user_id
+            ORDER BY logs DESC
+            LIMIT ?
+        """, (start_day, end_day, top))
+        top_users = c.fetchall()
+
+    return {
+        "start": start_day,
+        "end": end_day,
+        "periods": periods,
+        "total_logs": total,
+        "drowsy_logs": drowsy,
+        "top_users": top_users,
+    }
+
+
+def week_range(day):
+    """Monday..Sunday of the week before `day` (a date)."""
+    end = day - timedelta(days=day.weekday() + 1)
+    return (end - timedelta(days=6)).isoformat(), end.isoformat()
+
+
+def month_range(day):
+    """First..last day of the month before `day` (a date)."""
+    end = day.replace(day=1) - timedelta(days=1)
+    return end.replace(day=1).isoformat(), end.isoformat()
@@ -8,23 +8,49 @@ load_dotenv()
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 CHAT_ID = os.getenv("CHAT_ID")
 
+# (connect, read) seconds; a hung request must never hold a worker forever
+TIMEOUT = (5, 15)
+
+# keep-alive session reused for every message
+_session = requests.Session()
+
+class TelegramError(RuntimeError):
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        # seconds Telegram asked us to wait (HTTP 429), if any
+        self.retry_after = retry_after
+
+def deliver_telegram(message, chat_id=None):
+    """
+    Sends a Telegram message using the Bot API; raises on failure.
+    """
+    url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
+    payload = {
+        "chat_id": chat_id or CHAT_ID,
+        "text": message
+    }
+    response = _session.post(url, data=payload, timeout=TIMEOUT)
+    if response.status_code != 200:
+        retry_after = None
+        if response.status_code == 429:
+            try:
+                retry_after = response.json().get("parameters", {}).get("retry_after")
+            except ValueError:
+                pass
+        raise TelegramError(f"Telegram API error {response.status_code}: {response.text}",
+                            retry_after=retry_after)
+
 def send_telegram_alert(message):
     """
     Sends a Telegram message using the Bot API.
     """
     try:
-        url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
-        payload = {
-            "chat_id": CHAT_ID,
-            "text": message
-        }
-        response = requests.post(url, data=payload)
-        if response.status_code == 200:
-            print("✅ Telegram alert sent successfully!")
-        else:
-            print(f"❌ Failed to send Telegram alert: {response.text}")
+        deliver_telegram(message)
+        print("✅ Telegram alert sent successfully!")
+        return True
     except Exception as e:
         print(f"❌ Telegram alert failed: {e}")
+        return False
 
 # Test directly from this file
 if __name__ == "__main__":